@@ -0,0 +1,81 @@
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Generic, Hashable, Iterator, Optional, TypeVar
+
+# The DynamoDB tables of the caches have a string partition key, and TTL enabled
+# on the number attribute 'expiresAt' in epoch seconds. DynamoDB deletes expired
+# items lazily, up to a few days later, so an item read from a table is checked
+# with `is_expired`.
+EXPIRES_AT = "expiresAt"
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class LRUCache(Generic[K, V]):
+    """
+    A mapping that evicts the least recently used keys when the total size of its
+    values is over `max_size`. Each value has a size of 1, or of `sizeof(value)`.
+    """
+
+    def __init__(self, max_size: int, sizeof: Optional[Callable[[V], int]] = None):
+        self.max_size = max_size
+        self.sizeof = sizeof
+        self.total_size = 0
+        # from the least to the most recently used
+        self.entries: "OrderedDict[K, V]" = OrderedDict()
+
+    def __contains__(self, key: Any) -> bool:
+        return key in self.entries
+
+    def __iter__(self) -> Iterator[K]:
+        return iter(self.entries)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def _size(self, value: V) -> int:
+        return 1 if self.sizeof is None else self.sizeof(value)
+
+    def get(self, key: K, default: Any = None) -> Any:
+        """Return the value of the key, which becomes the most recently used"""
+        if key not in self.entries:
+            return default
+        self.entries.move_to_end(key)
+        return self.entries[key]
+
+    def put(self, key: K, value: V) -> list[tuple[K, V]]:
+        """
+        Set the value of the key as the most recently used, and return the items
+        evicted to make room for it
+        """
+        self.pop(key)
+        self.entries[key] = value
+        self.total_size += self._size(value)
+        evicted = []
+        while self.total_size > self.max_size:
+            evicted.append(self.popitem())
+        return evicted
+
+    def pop(self, key: K, default: Any = None) -> Any:
+        if key not in self.entries:
+            return default
+        value = self.entries.pop(key)
+        self.total_size -= self._size(value)
+        return value
+
+    def popitem(self) -> tuple[K, V]:
+        """Remove and return the least recently used item"""
+        key, value = self.entries.popitem(last=False)
+        self.total_size -= self._size(value)
+        return key, value
+
+
+def expires_at(ttl: float) -> dict[str, str]:
+    """Return the 'expiresAt' attribute of an item that expires in `ttl` seconds"""
+    return {"N": str(int(time.time() + ttl))}
+
+
+def is_expired(item: dict[str, Any]) -> bool:
+    """Return whether an item read from a table has expired"""
+    return int(item[EXPIRES_AT]["N"]) <= time.time()
@@ -0,0 +1,166 @@
+import json
+import re
+from typing import Any
+
+# each carousel message can contain no more than 12 bubbles
+MAX_CAROUSEL_BUBBLES = 12
+EXPIRY_ALT_TEXT = "รายการสินค้าใกล้หมดอายุ"
+WARNING_COLOR = "#e61919"
+
+
+def thumbnail_key(image_id: str) -> str:
+    return f"thumbnail/{image_id}"
+
+
+def image_url(bucket: str, region: str, image_id: str, thumbnails: list[str]) -> str:
+    """Return the URL of the thumbnail of the image, or of the image without one"""
+    key = thumbnail_key(image_id) if image_id in thumbnails else image_id
+    return f"https://{bucket}.s3.{region}.amazonaws.com/{key}"
+
+
+def expiry_bubble(url: str, text: str, color: str, warning: bool) -> dict[str, Any]:
+    """
+    Return a bubble of an item image with the text on a band of the color at the
+    bottom, and a WARNING badge at the top left with `warning`.
+    """
+    contents: list[dict[str, Any]] = [
+        {
+            "type": "image",
+            "url": url,
+            "size": "full",
+        },
+        {
+            "type": "box",
+            "layout": "vertical",
+            "contents": [
+                {
+                    "type": "box",
+                    "layout": "vertical",
+                    "contents": [
+                        {"type": "filler"},
+                        {
+                            "type": "box",
+                            "layout": "baseline",
+                            "contents": [
+                                {"type": "filler"},
+                                {
+                                    "type": "text",
+                                    "text": text,
+                                    "color": "#ffffff",
+                                    "flex": 0,
+                                    "weight": "bold",
+                                    "align": "center",
+                                    "size": "md",
+                                },
+                                {"type": "filler"},
+                            ],
+                            "spacing": "sm",
+                        },
+                        {"type": "filler"},
+                    ],
+                    "spacing": "sm",
+                    "margin": "none",
+                }
+            ],
+            "position": "absolute",
+            "offsetBottom": "0px",
+            "offsetStart": "0px",
+            "offsetEnd": "0px",
+            "backgroundColor": color,
+            "justifyContent": "center",
+            "alignItems": "center",
+            "paddingTop": "10px",
+            "paddingBottom": "10px",
+        },
+    ]
+    if warning:
+        contents.append(
+            {
+                "type": "box",
+                "layout": "vertical",
+                "contents": [
+                    {
+                        "type": "text",
+                        "text": "WARNING",
+                        "color": "#ffffff",
+                        "align": "center",
+                        "size": "xs",
+                        "offsetTop": "1px",
+                        "weight": "bold",
+                    }
+                ],
+                "position": "absolute",
+                "cornerRadius": "20px",
+                "offsetTop": "18px",
+                "backgroundColor": WARNING_COLOR,
+                "offsetStart": "18px",
+                "height": "30px",
+                "width": "80px",
+                "justifyContent": "center",
+                "alignItems": "center",
+            }
+        )
+    return {
+        "type": "bubble",
+        "body": {
+            "type": "box",
+            "layout": "vertical",
+            "contents": contents,
+            "paddingAll": "0px",
+        },
+    }
+
+
+class Template:
+    """
+    A JSON document serialized once, of which the string fields are filled in by
+    splicing their serialized values between the serialized static parts.
+    """
+
+    def __init__(self, document: dict[str, Any], fields: list[str]):
+        placeholders = {json.dumps(self.placeholder(field)): field for field in fields}
+        pattern = "|".join(re.escape(placeholder) for placeholder in placeholders)
+        skeleton = json.dumps(document, separators=(",", ":"))
+        # the static parts, and the field between each of them in document order
+        self.parts = re.split(pattern, skeleton)
+        self.fields = [placeholders[m] for m in re.findall(pattern, skeleton)]
+
+    @staticmethod
+    def placeholder(field: str) -> str:
+        return f"\0{field}\0"
+
+    def render(self, **values: str) -> str:
+        """Return the serialized document with the values of the fields"""
+        out = [self.parts[0]]
+        for field, part in zip(self.fields, self.parts[1:]):
+            out.append(json.dumps(values[field]))
+            out.append(part)
+        return "".join(out)
+
+
+def _expiry_bubble_template(warning: bool) -> Template:
+    placeholder = Template.placeholder
+    document = expiry_bubble(
+        placeholder("url"), placeholder("text"), placeholder("color"), warning
+    )
+    return Template(document, ["url", "text", "color"])
+
+
+EXPIRY_BUBBLE = _expiry_bubble_template(warning=False)
+WARNING_BUBBLE = _expiry_bubble_template(warning=True)
+
+
+def carousel_message(bubbles: list[str], alt_text: str = EXPIRY_ALT_TEXT) -> str:
+    """Return the serialized flex message of a carousel of serialized bubbles"""
+    return (
+        f'{{"type":"flex","altText":{json.dumps(alt_text)},'
+        f'"contents":{{"type":"carousel","contents":[{",".join(bubbles)}]}}}}'
+    )
+
+
+def carousel_messages(bubbles: list[str]) -> list[str]:
+    """Return the carousel messages of the bubbles, 12 bubbles per carousel"""
+    return [
+        carousel_message(bubbles[i : i + MAX_CAROUSEL_BUBBLES])
+        for i in range(0, len(bubbles), MAX_CAROUSEL_BUBBLES)
+    ]
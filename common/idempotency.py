@@ -0,0 +1,68 @@
+import os
+import time
+
+import caching
+
+# DynamoDB table keyed by 'eventId', with TTL as in `caching`, to find the
+# duplicates handled by another container. Only the in-memory cache is used when
+# it is not set.
+IDEMPOTENCY_TABLE = os.getenv("IDEMPOTENCY_TABLE")
+# LINE redelivers a webhook event for up to a day
+IDEMPOTENCY_TTL = int(os.getenv("IDEMPOTENCY_TTL", 24 * 60 * 60))
+MAX_MEMORY_ENTRIES = int(os.getenv("IDEMPOTENCY_CACHE_SIZE", 1024))
+
+dynamodb_client = None
+if IDEMPOTENCY_TABLE:
+    import boto3
+
+    dynamodb_client = boto3.client("dynamodb")
+
+# event id -> expiry time of the events seen by this container
+memory: "caching.LRUCache[str, float]" = caching.LRUCache(MAX_MEMORY_ENTRIES)
+stats = {"processed": 0, "memory_duplicates": 0, "table_duplicates": 0}
+
+
+def claim(key: str) -> bool:
+    """
+    Return True the first time an event is delivered, and False for its
+    duplicates, which should be skipped.
+    """
+    now = time.time()
+    if memory.get(key, 0) > now:
+        stats["memory_duplicates"] += 1
+        return False
+
+    expires_at = int(now) + IDEMPOTENCY_TTL
+    if dynamodb_client is not None:
+        try:
+            # an expired event may not be deleted yet, and is claimed again
+            dynamodb_client.put_item(
+                TableName=IDEMPOTENCY_TABLE,
+                Item={"eventId": {"S": key}, "expiresAt": {"N": str(expires_at)}},
+                ConditionExpression="attribute_not_exists(eventId) OR expiresAt < :now",
+                ExpressionAttributeValues={":now": {"N": str(int(now))}},
+            )
+        except dynamodb_client.exceptions.ConditionalCheckFailedException:
+            memory.put(key, expires_at)
+            stats["table_duplicates"] += 1
+            return False
+
+    memory.put(key, expires_at)
+    stats["processed"] += 1
+    return True
+
+
+def release(key: str):
+    """Forget an event that failed, so its redelivery is handled again"""
+    memory.pop(key, None)
+    if dynamodb_client is not None:
+        dynamodb_client.delete_item(
+            TableName=IDEMPOTENCY_TABLE, Key={"eventId": {"S": key}}
+        )
+
+
+def suppression_rate() -> float:
+    """Return the share of the deliveries that were skipped as duplicates"""
+    duplicates = stats["memory_duplicates"] + stats["table_duplicates"]
+    total = stats["processed"] + duplicates
+    return duplicates / total if total else 0.0
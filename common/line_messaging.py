@@ -0,0 +1,222 @@
+import json
+import math
+import os
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, NamedTuple, Optional, Union
+
+import rate_limit
+import urllib3
+
+LINE_ACCESS_TOKEN = os.getenv("LINE_ACCESS_TOKEN")
+LINE_API_URL = "https://api.line.me"
+# the LINE push API accepts at most 5 messages per request
+MAX_MESSAGES_PER_PUSH = 5
+# the number of users whose messages are pushed at the same time
+MAX_CONCURRENCY = int(os.getenv("LINE_PUSH_CONCURRENCY", 8))
+
+# a request is sent at most MAX_ATTEMPTS times, and at most RETRY_BUDGET retries
+# are made per invocation, so an outage of LINE does not use up the timeout
+MAX_ATTEMPTS = int(os.getenv("LINE_MAX_ATTEMPTS", 4))
+RETRY_BUDGET = int(os.getenv("LINE_RETRY_BUDGET", 20))
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# the backoff before the n-th retry is random up to BACKOFF_BASE * 2 ** n seconds
+BACKOFF_BASE = 0.5
+# give up rather than wait longer than this, e.g. when Retry-After is long
+MAX_RETRY_DELAY = 10.0
+# (connect, read) timeout in seconds
+TIMEOUT = urllib3.Timeout(connect=3.05, read=10)
+# the data of a postback that confirms the exp date after it, pushed by
+# jumnoiFulfillment and sent to Dialogflow as the text "ใช่" by jumnoiProxy
+CONFIRM_POSTBACK_PREFIX = "confirm:"
+
+# a connection for each worker, so none of them waits for or drops a connection
+http = urllib3.PoolManager(maxsize=MAX_CONCURRENCY)
+
+# a message object, or a message serialized beforehand, see flex_templates
+Message = Union[dict[str, Any], str]
+
+rate_limiter = rate_limit.RateLimiter()
+retries_left = RETRY_BUDGET
+retry_lock = threading.Lock()
+
+
+class DeliveryStats(NamedTuple):
+    requests: int
+    # the number of messages pushed and the number that could not be pushed
+    sent: int
+    failed: int
+    # the 95th percentile of the push request latencies in seconds
+    p95_latency: float
+
+
+def reset_retry_budget():
+    """Reset the retry budget, at the start of an invocation"""
+    global retries_left
+    retries_left = RETRY_BUDGET
+
+
+def _take_retry() -> bool:
+    global retries_left
+    with retry_lock:
+        if retries_left <= 0:
+            return False
+        retries_left -= 1
+        return True
+
+
+def _retry_delay(attempt: int, response: Optional[Any]) -> float:
+    """Return the delay before retrying, with a full jitter exponential backoff"""
+    delay = random.uniform(0, BACKOFF_BASE * 2**attempt)
+    retry_after = response.headers.get("Retry-After") if response else None
+    if retry_after is not None:
+        try:
+            delay = max(delay, float(retry_after))
+        except ValueError:  # an HTTP date, which LINE does not send
+            pass
+    return delay
+
+
+def post(path: str, body: str, retry_key: bool = False) -> bool:
+    """
+    Post to the LINE Messaging API with retries, and return whether the request
+    was accepted.
+
+    With `retry_key`, the retries of the request have the same X-Line-Retry-Key
+    header, so LINE does not send the messages twice when a response was lost.
+    """
+    headers = {
+        "Authorization": f"Bearer {LINE_ACCESS_TOKEN}",
+        "Content-Type": "application/json",
+    }
+    if retry_key:
+        headers["X-Line-Retry-Key"] = str(uuid.uuid4())
+
+    for attempt in range(MAX_ATTEMPTS):
+        response = None
+        rate_limiter.acquire()
+        try:
+            response = http.request(
+                "POST",
+                f"{LINE_API_URL}{path}",
+                headers=headers,
+                body=body,
+                timeout=TIMEOUT,
+                retries=False,
+            )
+        except urllib3.exceptions.HTTPError as e:
+            print("LINE request failed", path, e)
+        else:
+            if response.status == 200:
+                return True
+            # a previous attempt with the same retry key was accepted
+            if retry_key and response.status == 409:
+                return True
+            print("LINE request failed", path, response.status, response.data)
+            if response.status not in RETRY_STATUSES:
+                return False
+
+        if attempt + 1 == MAX_ATTEMPTS:
+            return False
+        delay = _retry_delay(attempt, response)
+        if delay > MAX_RETRY_DELAY or not _take_retry():
+            return False
+        time.sleep(delay)
+    return False
+
+
+def _encode(messages: list[Message]) -> str:
+    encoded = (m if isinstance(m, str) else json.dumps(m) for m in messages)
+    return f"[{','.join(encoded)}]"
+
+
+def push_messages(user_id: str, messages: list[Message]) -> bool:
+    """
+    Push up to `MAX_MESSAGES_PER_PUSH` messages to the user in a single request,
+    and return whether they were accepted.
+    """
+    body = f'{{"to":{json.dumps(user_id)},"messages":{_encode(messages)}}}'
+    return post("/v2/bot/message/push", body, retry_key=True)
+
+
+def reply_messages(reply_token: str, messages: list[Message]) -> bool:
+    """
+    Reply up to 5 messages with the reply token of an event, and return whether
+    they were accepted. The reply API does not support X-Line-Retry-Key, and a
+    reply token can be used only once, so a retry after a lost response fails.
+    """
+    body = f'{{"replyToken":{json.dumps(reply_token)},"messages":{_encode(messages)}}}'
+    return post("/v2/bot/message/reply", body)
+
+
+class MessageBatcher:
+    """
+    Queue the messages for each user, and push them in as few requests as
+    possible while keeping the order of the messages of a user.
+    """
+
+    def __init__(self):
+        # user id -> queued messages, in the order they were added
+        self.queues: dict[str, list[Message]] = {}
+
+    def add(self, user_id: str, message: Message):
+        self.queues.setdefault(user_id, []).append(message)
+
+    def batches(self) -> list[tuple[str, list[Message]]]:
+        """Return the (user id, messages) of each push request, in order"""
+        return [
+            (user_id, messages[i : i + MAX_MESSAGES_PER_PUSH])
+            for user_id, messages in self.queues.items()
+            for i in range(0, len(messages), MAX_MESSAGES_PER_PUSH)
+        ]
+
+    def flush(self) -> DeliveryStats:
+        """
+        Push all the queued messages, the messages of up to `MAX_CONCURRENCY` users
+        at the same time, and return the delivery stats.
+
+        The messages of a user are pushed one request after the other, and the
+        rest of them are dropped when a request fails, so the user never gets a
+        message without the ones before it.
+        """
+        user_batches: dict[str, list[list[Message]]] = {}
+        for user_id, messages in self.batches():
+            user_batches.setdefault(user_id, []).append(messages)
+        self.queues = {}
+
+        with ThreadPoolExecutor(max_workers=MAX_CONCURRENCY) as executor:
+            results = list(
+                executor.map(_deliver, user_batches.keys(), user_batches.values())
+            )
+        latencies = sorted(latency for _, _, user in results for latency in user)
+        return DeliveryStats(
+            requests=len(latencies),
+            sent=sum(sent for sent, _, _ in results),
+            failed=sum(failed for _, failed, _ in results),
+            p95_latency=(
+                latencies[math.ceil(len(latencies) * 0.95) - 1] if latencies else 0.0
+            ),
+        )
+
+
+def _deliver(
+    user_id: str, batches: list[list[Message]]
+) -> tuple[int, int, list[float]]:
+    """
+    Push the batches of messages to the user in order, and return the number of
+    messages sent and failed, and the latency of each request.
+    """
+    sent = 0
+    latencies = []
+    for messages in batches:
+        start = time.perf_counter()
+        pushed = push_messages(user_id, messages)
+        latencies.append(time.perf_counter() - start)
+        if not pushed:
+            break
+        sent += len(messages)
+    failed = sum(len(messages) for messages in batches) - sent
+    return sent, failed, latencies
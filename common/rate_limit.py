@@ -0,0 +1,116 @@
+import os
+import threading
+import time
+from typing import Optional
+
+import caching
+
+# requests per second to the LINE Messaging API and the largest burst of them,
+# LINE limits a channel to 2,000 push or reply requests per second. 0 disables
+# the rate limit.
+RATE_LIMIT = float(os.getenv("LINE_RATE_LIMIT", 100))
+RATE_BURST = int(os.getenv("LINE_RATE_BURST", 20))
+# DynamoDB table keyed by 'window', with TTL as in `caching`, to share the rate
+# limit with the concurrent invocations. The rate limit is per container when it
+# is not set.
+RATE_LIMIT_TABLE = os.getenv("LINE_RATE_LIMIT_TABLE")
+# requests reserved from the shared limit with a single DynamoDB update
+RESERVE_BLOCK = 10
+
+
+class TokenBucket:
+    """
+    Allow `rate` requests per second on average, and up to `burst` requests at
+    once after a pause.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Wait until a request is allowed"""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(
+                self.burst, self.tokens + (now - self.updated) * self.rate
+            )
+            self.updated = now
+            # take the token now, and wait until it would have been added
+            self.tokens -= 1
+            delay = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        if delay > 0:
+            time.sleep(delay)
+
+
+class SharedRateLimiter:
+    """
+    Allow `rate` requests per second across all the invocations, counted per
+    second in a DynamoDB table. Requests are reserved in blocks to save table
+    updates, and the unused ones of a block are lost at the end of the second.
+    """
+
+    def __init__(self, table_name: str, rate: float):
+        import boto3  # only loaded when the rate limit is shared
+
+        self.dynamodb_client = boto3.client("dynamodb")
+        self.table_name = table_name
+        self.rate = int(rate)
+        self.block = max(1, min(RESERVE_BLOCK, self.rate))
+        self.window = 0
+        self.reserved = 0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Wait until a request is allowed"""
+        with self.lock:
+            while True:
+                now = time.time()
+                window = int(now)
+                if window == self.window and self.reserved > 0:
+                    self.reserved -= 1
+                    return
+                if self._reserve(window):
+                    self.window = window
+                    self.reserved = self.block - 1
+                    return
+                time.sleep(window + 1 - now)
+
+    def _reserve(self, window: int) -> bool:
+        try:
+            self.dynamodb_client.update_item(
+                TableName=self.table_name,
+                Key={"window": {"S": f"line#{window}"}},
+                UpdateExpression="ADD requests :n SET expiresAt = :expiresAt",
+                ConditionExpression="attribute_not_exists(requests) OR requests <= :max",
+                ExpressionAttributeValues={
+                    ":n": {"N": str(self.block)},
+                    ":max": {"N": str(self.rate - self.block)},
+                    ":expiresAt": caching.expires_at(60),
+                },
+            )
+        except self.dynamodb_client.exceptions.ConditionalCheckFailedException:
+            return False
+        return True
+
+
+class RateLimiter:
+    """Smooth the requests of the container, and share the limit when configured"""
+
+    def __init__(self):
+        self.bucket: Optional[TokenBucket] = None
+        self.shared: Optional[SharedRateLimiter] = None
+        if RATE_LIMIT > 0:
+            self.bucket = TokenBucket(RATE_LIMIT, RATE_BURST)
+            if RATE_LIMIT_TABLE:
+                self.shared = SharedRateLimiter(RATE_LIMIT_TABLE, RATE_LIMIT)
+
+    def acquire(self):
+        """Wait until a request to the LINE Messaging API is allowed"""
+        if self.bucket is not None:
+            self.bucket.acquire()
+        if self.shared is not None:
+            self.shared.acquire()
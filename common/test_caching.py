@@ -0,0 +1,46 @@
+import time
+import unittest
+
+import caching
+
+
+class TestLRUCache(unittest.TestCase):
+    def test_evict_least_recently_used(self):
+        cache = caching.LRUCache(2)
+        self.assertEqual(cache.put("a", 1), [])
+        self.assertEqual(cache.put("b", 2), [])
+        self.assertEqual(cache.get("a"), 1)
+        self.assertEqual(cache.put("c", 3), [("b", 2)])
+        self.assertEqual(list(cache), ["a", "c"])
+        self.assertIsNone(cache.get("b"))
+
+    def test_put_existing_key(self):
+        cache = caching.LRUCache(2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        self.assertEqual(cache.put("a", 3), [])
+        self.assertEqual(list(cache), ["b", "a"])
+        self.assertEqual(cache.get("a"), 3)
+
+    def test_sizeof(self):
+        cache = caching.LRUCache(10, sizeof=len)
+        cache.put("a", b"1234")
+        cache.put("b", b"1234")
+        self.assertEqual(cache.put("c", b"1234"), [("a", b"1234")])
+        self.assertEqual(cache.total_size, 8)
+        cache.pop("b")
+        self.assertEqual(cache.total_size, 4)
+        # a value larger than the cache is evicted at once
+        self.assertEqual(cache.put("d", b"12345678901")[-1][0], "d")
+        self.assertEqual((len(cache), cache.total_size), (0, 0))
+
+
+class TestExpiry(unittest.TestCase):
+    def test_is_expired(self):
+        self.assertFalse(caching.is_expired({"expiresAt": caching.expires_at(60)}))
+        self.assertTrue(caching.is_expired({"expiresAt": caching.expires_at(-60)}))
+        self.assertTrue(caching.is_expired({"expiresAt": {"N": str(int(time.time()))}}))
+
+
+if __name__ == "__main__":
+    unittest.main()
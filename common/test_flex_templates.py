@@ -0,0 +1,49 @@
+import json
+import unittest
+
+import flex_templates
+
+URL = "https://bucket.s3.ap-southeast-1.amazonaws.com/thumbnail/1"
+TEXT = 'วันหมดอายุ: 20 June 2022 "quoted" \\'
+
+
+class TestFlexTemplates(unittest.TestCase):
+    def test_render(self):
+        for template, warning in (
+            (flex_templates.EXPIRY_BUBBLE, False),
+            (flex_templates.WARNING_BUBBLE, True),
+        ):
+            bubble = template.render(url=URL, text=TEXT, color="#03303A")
+            self.assertEqual(
+                json.loads(bubble),
+                flex_templates.expiry_bubble(URL, TEXT, "#03303A", warning),
+            )
+
+    def test_image_url(self):
+        self.assertEqual(
+            flex_templates.image_url("bucket", "ap-southeast-1", "1", ["1"]), URL
+        )
+        self.assertEqual(
+            flex_templates.image_url("bucket", "ap-southeast-1", "2", ["1"]),
+            "https://bucket.s3.ap-southeast-1.amazonaws.com/2",
+        )
+
+    def test_carousel_messages(self):
+        bubbles = [
+            flex_templates.EXPIRY_BUBBLE.render(url=f"{URL}{i}", text=TEXT, color="")
+            for i in range(13)
+        ]
+        messages = [json.loads(m) for m in flex_templates.carousel_messages(bubbles)]
+        self.assertEqual(len(messages), 2)
+        self.assertEqual(messages[0]["type"], "flex")
+        self.assertEqual(messages[0]["altText"], flex_templates.EXPIRY_ALT_TEXT)
+        self.assertEqual(messages[0]["contents"]["type"], "carousel")
+        self.assertEqual(len(messages[0]["contents"]["contents"]), 12)
+        self.assertEqual(
+            messages[1]["contents"]["contents"][0]["body"]["contents"][0]["url"],
+            f"{URL}12",
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
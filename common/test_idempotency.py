@@ -0,0 +1,43 @@
+import unittest
+from unittest import mock
+
+import idempotency
+
+
+class TestIdempotency(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.multiple(
+            idempotency,
+            memory=idempotency.caching.LRUCache(2),
+            stats={"processed": 0, "memory_duplicates": 0, "table_duplicates": 0},
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_claim(self):
+        self.assertTrue(idempotency.claim("a"))
+        self.assertFalse(idempotency.claim("a"))
+        self.assertTrue(idempotency.claim("b"))
+        self.assertAlmostEqual(idempotency.suppression_rate(), 1 / 3)
+
+    def test_expired(self):
+        self.assertTrue(idempotency.claim("a"))
+        idempotency.memory.put("a", 0)
+        self.assertTrue(idempotency.claim("a"))
+
+    def test_release(self):
+        self.assertTrue(idempotency.claim("a"))
+        idempotency.release("a")
+        self.assertTrue(idempotency.claim("a"))
+
+    def test_memory_limit(self):
+        for key in "abc":
+            idempotency.claim(key)
+        self.assertEqual(list(idempotency.memory), ["b", "c"])
+
+    def test_no_deliveries(self):
+        self.assertEqual(idempotency.suppression_rate(), 0.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,150 @@
+import unittest
+from typing import Optional
+from unittest import mock
+
+import line_messaging
+
+
+def text(i: int) -> dict[str, str]:
+    return {"type": "text", "text": str(i)}
+
+
+def response(status: int, headers: Optional[dict[str, str]] = None) -> mock.Mock:
+    return mock.Mock(status=status, headers=headers or {}, data=b"")
+
+
+class TestMessageBatcher(unittest.TestCase):
+    def test_batches(self):
+        batcher = line_messaging.MessageBatcher()
+        for i in range(7):
+            batcher.add("a", text(i))
+        batcher.add("b", text(7))
+        self.assertEqual(
+            batcher.batches(),
+            [
+                ("a", [text(i) for i in range(5)]),
+                ("a", [text(5), text(6)]),
+                ("b", [text(7)]),
+            ],
+        )
+
+    def test_flush(self):
+        batcher = line_messaging.MessageBatcher()
+        for i in range(6):
+            batcher.add("a", text(i))
+        with mock.patch.object(
+            line_messaging, "push_messages", return_value=True
+        ) as push_messages:
+            stats = batcher.flush()
+            self.assertEqual(batcher.flush().requests, 0)
+        self.assertEqual(
+            push_messages.call_args_list,
+            [
+                mock.call("a", [text(i) for i in range(5)]),
+                mock.call("a", [text(5)]),
+            ],
+        )
+        self.assertEqual((stats.requests, stats.sent, stats.failed), (2, 6, 0))
+
+    def test_flush_concurrently_in_user_order(self):
+        batcher = line_messaging.MessageBatcher()
+        for i in range(30):
+            for user_id in "abcd":
+                batcher.add(user_id, text(i))
+        pushed: dict[str, list[dict[str, str]]] = {}
+
+        def push_messages(user_id, messages):
+            pushed.setdefault(user_id, []).extend(messages)
+            return True
+
+        with mock.patch.object(line_messaging, "push_messages", push_messages):
+            stats = batcher.flush()
+        self.assertEqual(
+            pushed, {user_id: [text(i) for i in range(30)] for user_id in "abcd"}
+        )
+        self.assertEqual((stats.requests, stats.sent, stats.failed), (24, 120, 0))
+
+    def test_flush_failed(self):
+        batcher = line_messaging.MessageBatcher()
+        for i in range(12):
+            batcher.add("a", text(i))
+        batcher.add("b", text(0))
+
+        def push_messages(user_id, messages):
+            return user_id == "b"
+
+        with mock.patch.object(line_messaging, "push_messages", push_messages):
+            stats = batcher.flush()
+        # the messages after a failed request are not pushed
+        self.assertEqual((stats.requests, stats.sent, stats.failed), (2, 1, 12))
+
+
+@mock.patch.object(line_messaging.time, "sleep")
+@mock.patch.object(line_messaging.http, "request")
+class TestPost(unittest.TestCase):
+    def setUp(self):
+        line_messaging.retries_left = 0
+        line_messaging.reset_retry_budget()
+        self.assertEqual(line_messaging.retries_left, line_messaging.RETRY_BUDGET)
+
+    def test_retry(self, request, sleep):
+        request.side_effect = [response(500), response(429), response(200)]
+        self.assertTrue(line_messaging.push_messages("a", [text(0)]))
+        self.assertEqual(request.call_count, 3)
+        self.assertEqual(sleep.call_count, 2)
+        # the retries have the same retry key
+        retry_keys = {
+            c.kwargs["headers"]["X-Line-Retry-Key"] for c in request.mock_calls
+        }
+        self.assertEqual(len(retry_keys), 1)
+
+    def test_retry_after(self, request, sleep):
+        request.side_effect = [response(429, {"Retry-After": "3"}), response(200)]
+        self.assertTrue(line_messaging.push_messages("a", [text(0)]))
+        sleep.assert_called_once_with(3.0)
+
+    def test_retry_after_too_long(self, request, sleep):
+        request.return_value = response(429, {"Retry-After": "60"})
+        self.assertFalse(line_messaging.push_messages("a", [text(0)]))
+        self.assertEqual(request.call_count, 1)
+
+    def test_not_retried(self, request, sleep):
+        request.return_value = response(400)
+        self.assertFalse(line_messaging.reply_messages("token", [text(0)]))
+        self.assertEqual(request.call_count, 1)
+        self.assertNotIn("X-Line-Retry-Key", request.call_args.kwargs["headers"])
+
+    def test_already_accepted(self, request, sleep):
+        request.side_effect = [response(503), response(409)]
+        self.assertTrue(line_messaging.push_messages("a", [text(0)]))
+
+    def test_connection_error(self, request, sleep):
+        request.side_effect = [
+            line_messaging.urllib3.exceptions.ProtocolError(),
+            response(200),
+        ]
+        self.assertTrue(line_messaging.push_messages("a", [text(0)]))
+
+    def test_max_attempts(self, request, sleep):
+        request.return_value = response(500)
+        self.assertFalse(line_messaging.push_messages("a", [text(0)]))
+        self.assertEqual(request.call_count, line_messaging.MAX_ATTEMPTS)
+
+    def test_retry_budget(self, request, sleep):
+        request.return_value = response(500)
+        with mock.patch.object(line_messaging, "retries_left", 1):
+            self.assertFalse(line_messaging.push_messages("a", [text(0)]))
+            self.assertFalse(line_messaging.push_messages("a", [text(0)]))
+        self.assertEqual(request.call_count, 3)
+
+    def test_reset_retry_budget(self, request, sleep):
+        request.side_effect = [response(500), response(500), response(200)]
+        with mock.patch.object(line_messaging, "retries_left", 0):
+            self.assertFalse(line_messaging.push_messages("a", [text(0)]))
+            line_messaging.reset_retry_budget()
+            self.assertTrue(line_messaging.push_messages("a", [text(0)]))
+        self.assertEqual(request.call_count, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+import unittest
+from unittest import mock
+
+import rate_limit
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.now += seconds
+
+
+class TestTokenBucket(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch.multiple(
+            rate_limit.time, monotonic=self.clock.monotonic, sleep=self.clock.sleep
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_burst(self):
+        bucket = rate_limit.TokenBucket(rate=10, burst=5)
+        for _ in range(5):
+            bucket.acquire()
+        self.assertEqual(self.clock.now, 0)
+
+    def test_rate(self):
+        bucket = rate_limit.TokenBucket(rate=10, burst=5)
+        for _ in range(25):
+            bucket.acquire()
+        self.assertAlmostEqual(self.clock.now, 2.0)
+
+    def test_refill_up_to_burst(self):
+        bucket = rate_limit.TokenBucket(rate=10, burst=5)
+        bucket.acquire()
+        self.clock.now = 10.0
+        for _ in range(5):
+            bucket.acquire()
+        self.assertEqual(self.clock.now, 10.0)
+        bucket.acquire()
+        self.assertAlmostEqual(self.clock.now, 10.1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,7 +3,8 @@ import os
 from datetime import datetime, timedelta, timezone
 
 import boto3
-import urllib3
+import flex_templates
+import line_messaging
 
 LINE_ACCESS_TOKEN = os.getenv("LINE_ACCESS_TOKEN")
 BUCKET_NAME = os.getenv("BUCKET_NAME")
@@ -16,10 +17,10 @@ assert BUCKET_REGION is not None
 assert TABLE_NAME is not None
 
 dynamodb_client = boto3.client("dynamodb")
-http = urllib3.PoolManager()
 
 
 def lambda_handler(event, context):
+    line_messaging.reset_retry_budget()
     bangkok_tz = timezone(timedelta(hours=7))
     tomorrow = (datetime.now(tz=bangkok_tz) + timedelta(days=1)).strftime("%Y-%m-%d")
 
@@ -29,123 +30,32 @@ def lambda_handler(event, context):
         ExpressionAttributeValues={":expDate": {"S": tomorrow}},
     )
 
+    # the messages of all the users are pushed in batches of 5 messages per user
+    batcher = line_messaging.MessageBatcher()
     for item in dynamodb_response.get("Items", []):
         user_id = item.get("userId", {}).get("S")
         s3_url = [e for e in item.get("s3Url", {}).get("SS", [])]
+        thumbnails = item.get("thumbnails", {}).get("SS", [])
 
         msg = {
             "type": "text",
             "text": f"คุณมีสินค้าที่กำลังจะหมดอายุในวันพรุ่งนี้จำนวน {len(s3_url)} รายการ ดังนี้",
         }
-        push_message(user_id, msg)
-
-        # each carousel message can contain no more than 12 images
-        for i in range(0, len(s3_url), 12):
-            msg = {
-                "type": "flex",
-                "altText": "รายการสินค้าใกล้หมดอายุ",
-                "contents": {
-                    "type": "carousel",
-                    "contents": [
-                        {
-                            "type": "bubble",
-                            "body": {
-                                "type": "box",
-                                "layout": "vertical",
-                                "contents": [
-                                    {
-                                        "type": "image",
-                                        "url": f"https://{BUCKET_NAME}.s3.{BUCKET_REGION}.amazonaws.com/{url}",
-                                        "size": "full",
-                                    },
-                                    {
-                                        "type": "box",
-                                        "layout": "vertical",
-                                        "contents": [
-                                            {
-                                                "type": "box",
-                                                "layout": "vertical",
-                                                "contents": [
-                                                    {"type": "filler"},
-                                                    {
-                                                        "type": "box",
-                                                        "layout": "baseline",
-                                                        "contents": [
-                                                            {"type": "filler"},
-                                                            {
-                                                                "type": "text",
-                                                                "text": "หมดอายุวันพรุ่งนี้",
-                                                                "color": "#ffffff",
-                                                                "flex": 0,
-                                                                "weight": "bold",
-                                                                "align": "center",
-                                                                "size": "md",
-                                                            },
-                                                            {"type": "filler"},
-                                                        ],
-                                                        "spacing": "sm",
-                                                    },
-                                                    {"type": "filler"},
-                                                ],
-                                                "spacing": "sm",
-                                                "margin": "none",
-                                            }
-                                        ],
-                                        "position": "absolute",
-                                        "offsetBottom": "0px",
-                                        "offsetStart": "0px",
-                                        "offsetEnd": "0px",
-                                        "backgroundColor": "#e61919",
-                                        "justifyContent": "center",
-                                        "alignItems": "center",
-                                        "paddingTop": "10px",
-                                        "paddingBottom": "10px",
-                                    },
-                                    {
-                                        "type": "box",
-                                        "layout": "vertical",
-                                        "contents": [
-                                            {
-                                                "type": "text",
-                                                "text": "WARNING",
-                                                "color": "#ffffff",
-                                                "align": "center",
-                                                "size": "xs",
-                                                "offsetTop": "1px",
-                                                "weight": "bold",
-                                            }
-                                        ],
-                                        "position": "absolute",
-                                        "cornerRadius": "20px",
-                                        "offsetTop": "18px",
-                                        "backgroundColor": "#e61919",
-                                        "offsetStart": "18px",
-                                        "height": "30px",
-                                        "width": "80px",
-                                        "justifyContent": "center",
-                                        "alignItems": "center",
-                                    },
-                                ],
-                                "paddingAll": "0px",
-                            },
-                        }
-                        for url in s3_url[i : i + 12]
-                    ],
-                },
-            }
-            push_message(user_id, msg)
+        batcher.add(user_id, msg)
+
+        bubbles = [
+            flex_templates.WARNING_BUBBLE.render(
+                url=flex_templates.image_url(
+                    BUCKET_NAME, BUCKET_REGION, url, thumbnails
+                ),
+                text="หมดอายุวันพรุ่งนี้",
+                color=flex_templates.WARNING_COLOR,
+            )
+            for url in s3_url
+        ]
+        for msg in flex_templates.carousel_messages(bubbles):
+            batcher.add(user_id, msg)
+
+    print("Delivery stats", batcher.flush())
 
     return {"statusCode": 200, "body": json.dumps("Done!")}
-
-
-def push_message(user_id, payload):
-    http.request(
-        "POST",
-        "https://api.line.me/v2/bot/message/push",
-        headers={
-            "Authorization": f"Bearer {LINE_ACCESS_TOKEN}",
-            "Content-Type": "application/json",
-        },
-        body=json.dumps({"to": user_id, "messages": [payload]}),
-        retries=False,
-    )
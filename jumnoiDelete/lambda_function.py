@@ -3,6 +3,7 @@ import os
 from datetime import datetime, timedelta, timezone
 
 import boto3
+import flex_templates
 import urllib3
 
 BUCKET_NAME = os.getenv("BUCKET_NAME")
@@ -41,6 +42,10 @@ def lambda_handler(event, context):
         {"Key": e}
         for item in dynamodb_response.get("Items", [])
         for e in item.get("s3Url", {}).get("SS", [])
+    ] + [
+        {"Key": flex_templates.thumbnail_key(e)}
+        for item in dynamodb_response.get("Items", [])
+        for e in item.get("thumbnails", {}).get("SS", [])
     ]
 
     for i in range(0, len(s3_key), 1000):
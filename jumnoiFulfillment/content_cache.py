@@ -0,0 +1,62 @@
+import os
+from typing import Optional
+
+import caching
+
+CACHE_DIR = os.getenv("CONTENT_CACHE_DIR", "/tmp/line-content")
+# Lambda has 512 MB of /tmp by default
+MAX_CACHE_BYTES = int(os.getenv("CONTENT_CACHE_MAX_BYTES", 128 * 1024 * 1024))
+
+# file name -> size
+entries: "caching.LRUCache[str, int]" = caching.LRUCache(MAX_CACHE_BYTES, sizeof=int)
+
+
+def _load_entries():
+    """Index the files left in the cache directory by the previous invocations"""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    files = [entry for entry in os.scandir(CACHE_DIR) if entry.is_file()]
+    for entry in sorted(files, key=lambda entry: entry.stat().st_mtime):
+        if entry.name.endswith(".tmp"):
+            os.remove(entry.path)
+            continue
+        _remove_files(entries.put(entry.name, entry.stat().st_size))
+
+
+def _path(key: str) -> str:
+    return os.path.join(CACHE_DIR, key)
+
+
+def get(key: str) -> Optional[bytes]:
+    """Return the cached content of the key, or None when it is not cached"""
+    if entries.get(key) is None:
+        return None
+    try:
+        with open(_path(key), "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        entries.pop(key)
+        return None
+
+
+def put(key: str, content: bytes):
+    """Cache the content, evicting the least recently used contents over the limit"""
+    if len(content) > MAX_CACHE_BYTES:
+        return
+
+    # write to a temporary file first, so a timeout never leaves a partial file
+    tmp_path = f"{_path(key)}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(content)
+    os.replace(tmp_path, _path(key))
+    _remove_files(entries.put(key, len(content)))
+
+
+def _remove_files(evicted: list[tuple[str, int]]):
+    for key, _ in evicted:
+        try:
+            os.remove(_path(key))
+        except FileNotFoundError:
+            pass
+
+
+_load_entries()
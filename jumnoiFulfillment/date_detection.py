@@ -1,36 +1,128 @@
-import calendar
+import bisect
 import itertools
+import math
 import re
-from datetime import date
-from typing import Optional
+from datetime import date, timedelta
+from functools import lru_cache
+from typing import Any, NamedTuple, Optional
 
-MONTH_NUMBER = {
-    month.upper(): idx for (idx, month) in enumerate(calendar.month_abbr)
-} | {month.upper(): idx for (idx, month) in enumerate(calendar.month_name)}
+from date_pattern import DATE_PATTERN, MONTH_NUMBER
 
+THAI_MONTH_NAME = (
+    "มกราคม",
+    "กุมภาพันธ์",
+    "มีนาคม",
+    "เมษายน",
+    "พฤษภาคม",
+    "มิถุนายน",
+    "กรกฎาคม",
+    "สิงหาคม",
+    "กันยายน",
+    "ตุลาคม",
+    "พฤศจิกายน",
+    "ธันวาคม",
+)
+THAI_MONTH_ABBR = (
+    "ม.ค.",
+    "ก.พ.",
+    "มี.ค.",
+    "เม.ย.",
+    "พ.ค.",
+    "มิ.ย.",
+    "ก.ค.",
+    "ส.ค.",
+    "ก.ย.",
+    "ต.ค.",
+    "พ.ย.",
+    "ธ.ค.",
+)
 
-def get_date_regex() -> re.Pattern[str]:
+# characters that OCR confuses with digits, and Thai digits
+OCR_DIGIT_TABLE = str.maketrans("OoIl|S๐๑๒๓๔๕๖๗๘๙", "0011150123456789")
+# a run of digits, confusable characters and seperators with a character to replace
+DATE_SHAPED_TOKEN = re.compile(
+    r"(?=[0-9/.\-]*[OoIl|S๐-๙])[0-9OoIl|S๐-๙][0-9OoIl|S๐-๙/.\-]+"
+)
+
+# keywords are matched against the detected text without whitespaces
+EXP_KEYWORDS = ("EXP", "BB", "BESTBEFORE", "USEBY", "หมดอายุ", "ควรบริโภคก่อน")
+MFG_KEYWORDS = ("MFG", "MFD", "PRODUCED", "ผลิต")
+KEYWORD_WEIGHTS = {keyword: 1.0 for keyword in EXP_KEYWORDS} | {
+    keyword: -1.0 for keyword in MFG_KEYWORDS
+}
+KEYWORD_REGEX = re.compile("|".join(KEYWORD_WEIGHTS))
+
+KEYWORD_WEIGHT = 2.0
+NEAR_KEYWORD_WEIGHT = 1.0
+NEAR_KEYWORD_RANGE = 20
+IMPLAUSIBLE_PENALTY = 3.0
+MAX_SHELF_LIFE = timedelta(days=10 * 365)
+
+# the longest text of a date, e.g. '30-September-2022'
+MAX_DATE_LENGTH = 20
+# the largest gap between 2 stitched tokens, relative to the token height
+MAX_HORIZONTAL_GAP = 1.5
+MAX_VERTICAL_GAP = 1.0
+
+
+def build_month_number() -> dict[str, int]:
+    """Return the month number of every month name and abbreviation in upper case"""
+    import calendar
+
+    return (
+        {month.upper(): idx for (idx, month) in enumerate(calendar.month_abbr)}
+        | {month.upper(): idx for (idx, month) in enumerate(calendar.month_name)}
+        | {month: idx for (idx, month) in enumerate(THAI_MONTH_NAME, 1)}
+        | {month: idx for (idx, month) in enumerate(THAI_MONTH_ABBR, 1)}
+        # abbreviations are often printed or detected without the dots
+        | {
+            month.replace(".", ""): idx
+            for (idx, month) in enumerate(THAI_MONTH_ABBR, 1)
+        }
+    )
+
+
+def build_date_pattern() -> str:
     """
-    Return a regex that can detect and capture the components of date.
+    Return the pattern of the date regex.
 
-    Capture group detail:
-        - Group 1: The front part of date. Possible values are 'day', 'month' or 'year'
-        - Group 2: The seperator. Possible values are '/', '-', '.' or empty string
-        - Group 3: The middle part of date. Possible values are 'day' or 'month'
-        - Group 4: The back part of date. Possible values are 'day' or 'year'
+    The pattern is frozen into `date_pattern.py` by `utils/freeze_date_pattern.py`
+    when packaging, so a cold start does not have to build it.
     """
+    import calendar
+    import itertools
+
     seperator = r"\/|-|\.|[ ]*"
     month_name = "|".join(
-        itertools.chain(calendar.month_abbr[1:], calendar.month_name[1:])
+        itertools.chain(
+            calendar.month_abbr[1:],
+            calendar.month_name[1:],
+            THAI_MONTH_NAME,
+            map(re.escape, THAI_MONTH_ABBR),
+            (month.replace(".", "") for month in THAI_MONTH_ABBR),
+        )
     )
     month_number = r"1[0-2]|0?[1-9]"
     day = r"3[01]|[12][0-9]|0?[1-9]"
     year_front = r"20\d{2}"
     year_back = r"(?:20|25)?\d{2}"
-    return re.compile(
-        rf"({year_front}|{month_number}|{day})({seperator})({month_name}|{month_number}|{day})\2({year_back}|{day})",
-        re.IGNORECASE,
-    )
+    return rf"({year_front}|{month_number}|{day})({seperator})({month_name}|{month_number}|{day})\2({year_back}|{day})"
+
+
+@lru_cache(maxsize=None)
+def get_date_regex() -> re.Pattern[str]:
+    """
+    Return a regex that can detect and capture the components of date.
+
+    The regex is compiled from the frozen pattern on the first call.
+
+    Capture group detail:
+        - Group 1: The front part of date. Possible values are 'day', 'month' or 'year'
+        - Group 2: The seperator. Possible values are '/', '-', '.' or empty string
+        - Group 3: The middle part of date. Possible values are 'day' or 'month'
+        - Group 4: The back part of date. Possible values are 'day' or 'year'
+    """
+    return re.compile(DATE_PATTERN, re.IGNORECASE)
 
 
 def create_date(front: str, middle: str, back: str) -> Optional[date]:
@@ -65,3 +157,396 @@ def create_date(front: str, middle: str, back: str) -> Optional[date]:
         return date(day=day_num, month=month_num, year=year_num)
     except ValueError:
         return None
+
+
+def _normalize_token(result: re.Match[str]) -> str:
+    text = result.string
+    start, end = result.span()
+    # a confusable character touching a letter is part of a word, e.g. 'O' in 'OCT'
+    while not text[start].isdigit() and start > 0 and text[start - 1].isalpha():
+        start += 1
+        if start == end:
+            return result.group()
+    while (
+        end > start
+        and not text[end - 1].isdigit()
+        and end < len(text)
+        and text[end].isalpha()
+    ):
+        end -= 1
+
+    token = text[start:end]
+    digit_count = sum(char.isdigit() for char in token)
+    confused_count = sum(char.isalpha() or char == "|" for char in token)
+    if digit_count == 0 or confused_count > digit_count:
+        return result.group()
+    return (
+        text[result.start() : start]
+        + token.translate(OCR_DIGIT_TABLE)
+        + text[end : result.end()]
+    )
+
+
+def normalize_ocr_text(text: str) -> str:
+    """
+    Replace the characters that OCR confuses with digits (e.g. 'O' for '0') and the
+    Thai digits with ASCII digits.
+
+    Only date-shaped tokens are replaced: runs of digits, confusable characters and
+    seperators with at least as many real digits as confusable characters.
+    Confusable characters touching a letter are kept, so words like 'SEP' or the
+    month in '15OCT' are not changed.
+    """
+    return DATE_SHAPED_TOKEN.sub(_normalize_token, text)
+
+
+class DateMatch(NamedTuple):
+    """A valid date found in a text together with its position"""
+
+    value: date
+    start: int
+    end: int
+
+
+def remove_whitespace(text: str) -> tuple[str, frozenset[int]]:
+    """
+    Return the text without whitespaces, and the positions in it where a word
+    started after a whitespace.
+    """
+    words = text.split()
+    word_starts = itertools.accumulate(len(word) for word in words[:-1])
+    return "".join(words), frozenset(word_starts)
+
+
+def find_dates(
+    text: str,
+    date_regex: Optional[re.Pattern[str]] = None,
+    word_starts: frozenset[int] = frozenset(),
+) -> list[DateMatch]:
+    """
+    Find every valid date anywhere in the given text.
+
+    The text is searched from every position, so a date that overlaps an invalid
+    match is still found. To avoid picking dates out of lot or barcode numbers, a
+    match must not start or end inside a run of digits, and a date without
+    seperator must use two digits for its day and month (e.g. '151222'). The
+    `word_starts` of a text without whitespaces end the runs of digits, so the
+    date of 'EXP 15.12.2022 13:45' is found.
+    """
+    if date_regex is None:
+        date_regex = get_date_regex()
+
+    matches: list[DateMatch] = []
+    pos = 0
+    while True:
+        result = date_regex.search(text, pos)
+        if result is None:
+            break
+        start, end = result.span()
+        pos = start + 1
+
+        if (start > 0 and text[start - 1].isdigit() and start not in word_starts) or (
+            end < len(text) and text[end].isdigit() and end not in word_starts
+        ):
+            continue
+        front, seperator, middle, back = result.groups()
+        if not seperator and middle.isdigit() and (len(front) < 2 or len(middle) < 2):
+            continue
+
+        detected_date = create_date(front, middle, back)
+        if detected_date is not None:
+            matches.append(DateMatch(detected_date, start, end))
+
+    return matches
+
+
+class DateCandidate(NamedTuple):
+    """A date detected in a Rekognition text detection"""
+
+    value: date
+    prefix: str
+    confidence: float
+    box: Optional[dict[str, float]]
+
+
+def _find_keyword(text: str) -> tuple[int, float]:
+    """
+    Return the position of the last date keyword in the text and its weight.
+
+    The weight is positive for an expiry keyword and negative for a manufacturing
+    keyword. The position is -1 when the text contains no keyword.
+    """
+    found_at, found_weight = -1, 0.0
+    for result in KEYWORD_REGEX.finditer(text):
+        found_at, found_weight = result.start(), KEYWORD_WEIGHTS[result.group()]
+    return found_at, found_weight
+
+
+def _box_center(box: dict[str, float]) -> tuple[float, float]:
+    return box["Left"] + box["Width"] / 2, box["Top"] + box["Height"] / 2
+
+
+class KeywordIndex:
+    """The centers of the keyword detections, sorted by their y coordinate"""
+
+    def __init__(self, keyword_boxes: list[tuple[dict[str, float], float]]):
+        centers = [(_box_center(box), weight) for box, weight in keyword_boxes]
+        self.keywords = sorted((y, x, weight) for (x, y), weight in centers)
+        self.ys = [y for y, _, _ in self.keywords]
+
+    def nearest_bonus(self, box: dict[str, float]) -> float:
+        """
+        Return the weight of the nearest keyword divided by 1 + its distance in
+        box heights. Only the keywords within `NEAR_KEYWORD_RANGE` box heights
+        above or below the box are compared, as the bonus of a farther keyword is
+        negligible.
+        """
+        x, y = _box_center(box)
+        height = max(box["Height"], 1e-3)
+        start = bisect.bisect_left(self.ys, y - height * NEAR_KEYWORD_RANGE)
+        end = bisect.bisect_right(self.ys, y + height * NEAR_KEYWORD_RANGE)
+
+        nearest_distance, nearest_weight = math.inf, 0.0
+        for keyword_y, keyword_x, weight in self.keywords[start:end]:
+            distance = math.hypot(keyword_x - x, keyword_y - y) / height
+            if distance < nearest_distance:
+                nearest_distance, nearest_weight = distance, weight
+        return nearest_weight / (1 + nearest_distance)
+
+
+def score_date(candidate: DateCandidate, keywords: KeywordIndex, today: date) -> float:
+    """
+    Score how likely the candidate is the expiry date of the product.
+
+    The score adds up the Rekognition confidence, the keyword written in front of
+    the date in the same detection, the nearest keyword detection on the image
+    and the plausibility of the date itself.
+    """
+    score = candidate.confidence / 100
+
+    _, weight = _find_keyword(candidate.prefix)
+    score += KEYWORD_WEIGHT * weight
+
+    if candidate.box is not None:
+        score += NEAR_KEYWORD_WEIGHT * keywords.nearest_bonus(candidate.box)
+
+    if candidate.value < today:
+        score -= IMPLAUSIBLE_PENALTY
+    elif candidate.value > today + MAX_SHELF_LIFE:
+        score -= IMPLAUSIBLE_PENALTY
+
+    return score
+
+
+def rank_dates(
+    candidates: list[DateCandidate],
+    keyword_boxes: list[tuple[dict[str, float], float]],
+    today: Optional[date] = None,
+) -> list[date]:
+    """
+    Rank the candidate dates from the most to the least likely expiry date.
+
+    Each date is ranked by its best scoring candidate, and dates with the same
+    score are ranked latest first.
+    """
+    if today is None:
+        today = date.today()
+
+    keywords = KeywordIndex(keyword_boxes)
+    scores: dict[date, float] = {}
+    for candidate in candidates:
+        score = score_date(candidate, keywords, today)
+        scores[candidate.value] = max(score, scores.get(candidate.value, score))
+
+    return sorted(scores, key=lambda value: (scores[value], value), reverse=True)
+
+
+class TextToken(NamedTuple):
+    """
+    A detected text, without whitespaces, with its position on the image and the
+    positions where its words started
+    """
+
+    text: str
+    confidence: float
+    box: Optional[dict[str, float]]
+    word_starts: frozenset[int] = frozenset()
+
+
+def _union_box(boxes: list[dict[str, float]]) -> dict[str, float]:
+    left = min(box["Left"] for box in boxes)
+    top = min(box["Top"] for box in boxes)
+    return {
+        "Left": left,
+        "Top": top,
+        "Width": max(box["Left"] + box["Width"] for box in boxes) - left,
+        "Height": max(box["Top"] + box["Height"] for box in boxes) - top,
+    }
+
+
+def _follow_direction(box: dict[str, float], other: dict[str, float]) -> Optional[str]:
+    """
+    Return 'right' or 'below' when the other box directly follows the box on the
+    same row or in the same column, otherwise None.
+    """
+    height = max(box["Height"], other["Height"])
+    # allow the boxes to overlap a little
+    slack = height * 0.1
+
+    vertical_overlap = min(
+        box["Top"] + box["Height"], other["Top"] + other["Height"]
+    ) - max(box["Top"], other["Top"])
+    horizontal_gap = other["Left"] - (box["Left"] + box["Width"])
+    if (
+        vertical_overlap > min(box["Height"], other["Height"]) / 2
+        and -slack <= horizontal_gap <= height * MAX_HORIZONTAL_GAP
+    ):
+        return "right"
+
+    horizontal_overlap = min(
+        box["Left"] + box["Width"], other["Left"] + other["Width"]
+    ) - max(box["Left"], other["Left"])
+    vertical_gap = other["Top"] - (box["Top"] + box["Height"])
+    if horizontal_overlap > 0 and -slack <= vertical_gap <= height * MAX_VERTICAL_GAP:
+        return "below"
+
+    return None
+
+
+def stitch_tokens(tokens: list[TextToken]) -> list[tuple[TextToken, int]]:
+    """
+    Join tokens that follow each other on the same row or in the same column, so a
+    date split across them (e.g. '15 DEC' above '2022') can be detected.
+
+    Return the stitched tokens with the text length of their first token. Up to 3
+    tokens are joined in reading order. A date always starts with a digit, so
+    only a token with a digit near its end starts a stitched token. The tokens are
+    sorted by their top edge and each token is only compared with the tokens
+    starting near its own row, so the stitching takes O(n log n) instead of
+    comparing every pair.
+    """
+    tokens = sorted(
+        (token for token in tokens if token.box is not None),
+        key=lambda token: token.box["Top"],
+    )
+    tops = [token.box["Top"] for token in tokens]
+    following: dict[int, dict[str, int]] = {}
+
+    def find_following(i: int) -> dict[str, int]:
+        """Return the index of the nearest token following the token in each direction"""
+        if i in following:
+            return following[i]
+        box = tokens[i].box
+        nearest: dict[str, float] = {}
+        following[i] = {}
+        window_start = bisect.bisect_left(tops, box["Top"] - box["Height"])
+        window_end = bisect.bisect_right(
+            tops, box["Top"] + box["Height"] * (1 + MAX_VERTICAL_GAP)
+        )
+        for j in range(window_start, window_end):
+            other = tokens[j].box
+            direction = _follow_direction(box, other) if j != i else None
+            if direction is None:
+                continue
+            distance = abs(other["Left"] - box["Left"]) + abs(other["Top"] - box["Top"])
+            if distance < nearest.get(direction, math.inf):
+                nearest[direction] = distance
+                following[i][direction] = j
+        return following[i]
+
+    stitched: list[tuple[TextToken, int]] = []
+    for i, token in enumerate(tokens):
+        if not any(char.isdigit() for char in token.text[-MAX_DATE_LENGTH:]):
+            continue
+        for direction in ("right", "below"):
+            chain = [token]
+            idx = i
+            word_starts = set(token.word_starts)
+            while len(chain) < 3 and direction in find_following(idx):
+                idx = following[idx][direction]
+                # the joined token starts a word
+                offset = sum(len(chain_token.text) for chain_token in chain)
+                word_starts.add(offset)
+                word_starts.update(offset + s for s in tokens[idx].word_starts)
+                chain.append(tokens[idx])
+                stitched_token = TextToken(
+                    "".join(chain_token.text for chain_token in chain),
+                    min(chain_token.confidence for chain_token in chain),
+                    _union_box([chain_token.box for chain_token in chain]),
+                    frozenset(word_starts),
+                )
+                stitched.append((stitched_token, len(token.text)))
+
+    return stitched
+
+
+def detect_dates(
+    detections: list[dict[str, Any]],
+    date_regex: Optional[re.Pattern[str]] = None,
+    today: Optional[date] = None,
+) -> list[date]:
+    """
+    Detect the dates in a Rekognition `TextDetections` list, most likely expiry
+    date first.
+
+    The text of a LINE detection already contains the text of its WORD detections,
+    so a WORD is only searched when its parent LINE is not in the list. WORD
+    detections are still used to locate the keywords on the image. Dates split
+    across adjacent detections are found by searching the stitched detections.
+    """
+    if date_regex is None:
+        date_regex = get_date_regex()
+
+    line_ids = {
+        detection["Id"] for detection in detections if detection.get("Type") == "LINE"
+    }
+    tokens: list[TextToken] = []
+    keyword_boxes: list[tuple[dict[str, float], float]] = []
+    for detection in detections:
+        box = detection.get("Geometry", {}).get("BoundingBox")
+        if box is not None:
+            keyword_at, weight = _find_keyword(
+                "".join(detection["DetectedText"].split()).upper()
+            )
+            if keyword_at != -1:
+                keyword_boxes.append((box, weight))
+
+        if detection.get("Type") == "WORD" and detection.get("ParentId") in line_ids:
+            continue
+        # remove all whitespaces from the testing string
+        text, word_starts = remove_whitespace(
+            normalize_ocr_text(detection["DetectedText"]).upper()
+        )
+        tokens.append(
+            TextToken(text, detection.get("Confidence", 0.0), box, word_starts)
+        )
+
+    candidates = [
+        DateCandidate(
+            match.value, token.text[: match.start], token.confidence, token.box
+        )
+        for token in tokens
+        for match in find_dates(token.text, date_regex, token.word_starts)
+    ]
+    # only the dates across the join of the stitched tokens are new, so only the
+    # text around the join is searched
+    for token, join in stitch_tokens(tokens):
+        start = max(join - MAX_DATE_LENGTH, 0)
+        while start > 0 and token.text[start - 1].isdigit():
+            start -= 1
+        end = min(join + MAX_DATE_LENGTH, len(token.text))
+        while end < len(token.text) and token.text[end].isdigit():
+            end += 1
+        word_starts = frozenset(s - start for s in token.word_starts if start < s < end)
+        candidates.extend(
+            DateCandidate(
+                match.value,
+                token.text[: start + match.start],
+                token.confidence,
+                token.box,
+            )
+            for match in find_dates(token.text[start:end], date_regex, word_starts)
+            if start + match.start < join < start + match.end
+        )
+
+    return rank_dates(candidates, keyword_boxes, today)
@@ -0,0 +1,65 @@
+# Generated by utils/freeze_date_pattern.py, do not edit.
+DATE_PATTERN = '(20\\d{2}|1[0-2]|0?[1-9]|3[01]|[12][0-9]|0?[1-9])(\\/|-|\\.|[ ]*)(Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec|January|February|March|April|May|June|July|August|September|October|November|December|มกราคม|กุมภาพันธ์|มีนาคม|เมษายน|พฤษภาคม|มิถุนายน|กรกฎาคม|สิงหาคม|กันยายน|ตุลาคม|พฤศจิกายน|ธันวาคม|ม\\.ค\\.|ก\\.พ\\.|มี\\.ค\\.|เม\\.ย\\.|พ\\.ค\\.|มิ\\.ย\\.|ก\\.ค\\.|ส\\.ค\\.|ก\\.ย\\.|ต\\.ค\\.|พ\\.ย\\.|ธ\\.ค\\.|มค|กพ|มีค|เมย|พค|มิย|กค|สค|กย|ตค|พย|ธค|1[0-2]|0?[1-9]|3[01]|[12][0-9]|0?[1-9])\\2((?:20|25)?\\d{2}|3[01]|[12][0-9]|0?[1-9])'
+
+MONTH_NUMBER = {
+    '': 0,
+    'JAN': 1,
+    'FEB': 2,
+    'MAR': 3,
+    'APR': 4,
+    'MAY': 5,
+    'JUN': 6,
+    'JUL': 7,
+    'AUG': 8,
+    'SEP': 9,
+    'OCT': 10,
+    'NOV': 11,
+    'DEC': 12,
+    'JANUARY': 1,
+    'FEBRUARY': 2,
+    'MARCH': 3,
+    'APRIL': 4,
+    'JUNE': 6,
+    'JULY': 7,
+    'AUGUST': 8,
+    'SEPTEMBER': 9,
+    'OCTOBER': 10,
+    'NOVEMBER': 11,
+    'DECEMBER': 12,
+    'มกราคม': 1,
+    'กุมภาพันธ์': 2,
+    'มีนาคม': 3,
+    'เมษายน': 4,
+    'พฤษภาคม': 5,
+    'มิถุนายน': 6,
+    'กรกฎาคม': 7,
+    'สิงหาคม': 8,
+    'กันยายน': 9,
+    'ตุลาคม': 10,
+    'พฤศจิกายน': 11,
+    'ธันวาคม': 12,
+    'ม.ค.': 1,
+    'ก.พ.': 2,
+    'มี.ค.': 3,
+    'เม.ย.': 4,
+    'พ.ค.': 5,
+    'มิ.ย.': 6,
+    'ก.ค.': 7,
+    'ส.ค.': 8,
+    'ก.ย.': 9,
+    'ต.ค.': 10,
+    'พ.ย.': 11,
+    'ธ.ค.': 12,
+    'มค': 1,
+    'กพ': 2,
+    'มีค': 3,
+    'เมย': 4,
+    'พค': 5,
+    'มิย': 6,
+    'กค': 7,
+    'สค': 8,
+    'กย': 9,
+    'ตค': 10,
+    'พย': 11,
+    'ธค': 12,
+}
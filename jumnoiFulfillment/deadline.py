@@ -0,0 +1,111 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Optional
+
+import caching
+
+# Dialogflow waits 5 seconds for the response of the webhook
+DIALOGFLOW_TIMEOUT = float(os.getenv("DIALOGFLOW_TIMEOUT", 5))
+# seconds kept to build and return the response, and for the time spent before
+# the handler started, e.g. a cold start
+RESPONSE_MARGIN = float(os.getenv("DEADLINE_MARGIN", 1.5))
+# the deferred work is run by invoking this function asynchronously on Lambda,
+# and on a local thread elsewhere, e.g. in tests
+FUNCTION_NAME = os.getenv("AWS_LAMBDA_FUNCTION_NAME")
+DEFER_MODE = os.getenv("DEFER_MODE", "invoke" if FUNCTION_NAME else "local")
+# the unfinished functions kept for the deferred work, whose invocation may run on
+# another instance and never take them
+MAX_UNFINISHED = int(os.getenv("DEADLINE_MAX_UNFINISHED", 16))
+
+# only created when some work is deferred
+lambda_client = None
+# key -> future of a function left running by `Deadline.run`, so the deferred
+# work can wait for it instead of calling it again, see `finish`
+unfinished: "caching.LRUCache[str, Future]" = caching.LRUCache(MAX_UNFINISHED)
+
+
+class Deadline:
+    """The time left to respond to Dialogflow, or before the Lambda timeout"""
+
+    def __init__(self, context: Any = None, timeout: float = DIALOGFLOW_TIMEOUT):
+        self.start = time.monotonic()
+        self.timeout = timeout
+        self.context = context
+
+    def remaining(self) -> float:
+        """Return the seconds left for the work before the response"""
+        remaining = self.timeout - (time.monotonic() - self.start)
+        if self.context is not None:
+            remaining = min(
+                remaining, self.context.get_remaining_time_in_millis() / 1000
+            )
+        return remaining - RESPONSE_MARGIN
+
+    def run(
+        self, func: Callable[..., Any], *args: Any, key: Optional[str] = None
+    ) -> tuple[bool, Any]:
+        """
+        Run the function until the deadline, and return whether it finished and
+        its result. An unfinished function keeps running on its thread, so it
+        must not have side effects that the deferred work would repeat. With a
+        key, the deferred work can get its result with `finish`.
+        """
+        executor = ThreadPoolExecutor(max_workers=1)
+        future = executor.submit(func, *args)
+        executor.shutdown(wait=False)
+        try:
+            return True, future.result(timeout=max(self.remaining(), 0))
+        except FutureTimeoutError:
+            if key is not None:
+                unfinished.put(key, future)
+            return False, None
+
+
+def finish(key: str, func: Callable[..., Any], *args: Any) -> Any:
+    """
+    Return the result of the function left running under the key by
+    `Deadline.run`, or call it when it ran on another instance of the function.
+    """
+    future = unfinished.pop(key, None)
+    if future is not None:
+        print("Finish unfinished", key)
+        return future.result()
+    return func(*args)
+
+
+def defer(task: str, payload: dict[str, Any]):
+    """Run the task with the payload after the response, see `run_deferred`"""
+    global lambda_client
+    print("Defer", task, payload)
+    event = {"deferredTask": task, "payload": payload}
+    if DEFER_MODE == "local":
+        threading.Thread(target=run_deferred, args=(event,)).start()
+        return
+
+    if lambda_client is None:
+        import boto3
+
+        lambda_client = boto3.client("lambda")
+    lambda_client.invoke(
+        FunctionName=FUNCTION_NAME,
+        InvocationType="Event",
+        Payload=json.dumps(event).encode(),
+    )
+
+
+# task name -> function of the payload, registered by the lambda function
+tasks: dict[str, Callable[[dict[str, Any]], None]] = {}
+
+
+def is_deferred(event: dict[str, Any]) -> bool:
+    return "deferredTask" in event
+
+
+def run_deferred(event: dict[str, Any]):
+    """Run a task deferred by `defer`"""
+    print("Run deferred", event["deferredTask"])
+    tasks[event["deferredTask"]](event["payload"])
@@ -0,0 +1,73 @@
+import json
+import os
+import zlib
+from typing import Any, Optional
+
+import caching
+
+# DynamoDB table keyed by 'imageHash', with TTL as in `caching`. Only the
+# in-memory cache is used when it is not set.
+DETECTION_CACHE_TABLE = os.getenv("DETECTION_CACHE_TABLE")
+DETECTION_CACHE_TTL = int(os.getenv("DETECTION_CACHE_TTL", 7 * 24 * 60 * 60))
+MAX_MEMORY_ENTRIES = int(os.getenv("DETECTION_CACHE_SIZE", 128))
+
+dynamodb_client = None
+if DETECTION_CACHE_TABLE:
+    import boto3
+
+    dynamodb_client = boto3.client("dynamodb")
+
+# image hash -> text detections
+memory: "caching.LRUCache[str, list[dict[str, Any]]]" = caching.LRUCache(
+    MAX_MEMORY_ENTRIES
+)
+# the table is only a cache, so its errors are counted and the detection goes on
+stats = {"memory_hits": 0, "table_hits": 0, "misses": 0, "table_errors": 0}
+
+
+def get(key: str) -> Optional[list[dict[str, Any]]]:
+    """Return the cached Rekognition text detections of an image, or None"""
+    detections = memory.get(key)
+    if detections is not None:
+        stats["memory_hits"] += 1
+        return detections
+
+    if dynamodb_client is not None:
+        try:
+            res = dynamodb_client.get_item(
+                TableName=DETECTION_CACHE_TABLE,
+                Key={"imageHash": {"S": key}},
+            )
+        except dynamodb_client.exceptions.ClientError as e:
+            print("Detection cache get failed", e)
+            stats["table_errors"] += 1
+            res = {}
+        item = res.get("Item")
+        if item is not None and not caching.is_expired(item):
+            detections = json.loads(zlib.decompress(item["detections"]["B"]))
+            memory.put(key, detections)
+            stats["table_hits"] += 1
+            return detections
+
+    stats["misses"] += 1
+    return None
+
+
+def put(key: str, detections: list[dict[str, Any]]):
+    """Cache the Rekognition text detections of an image"""
+    memory.put(key, detections)
+    if dynamodb_client is not None:
+        try:
+            # detections of a busy label can be large, and an item is limited to
+            # 400 KB
+            dynamodb_client.put_item(
+                TableName=DETECTION_CACHE_TABLE,
+                Item={
+                    "imageHash": {"S": key},
+                    "detections": {"B": zlib.compress(json.dumps(detections).encode())},
+                    caching.EXPIRES_AT: caching.expires_at(DETECTION_CACHE_TTL),
+                },
+            )
+        except dynamodb_client.exceptions.ClientError as e:
+            print("Detection cache put failed", e)
+            stats["table_errors"] += 1
@@ -0,0 +1,100 @@
+from typing import Any, Callable, Optional, Union
+
+
+class Payload:
+    """A custom payload message, e.g. {"line": <LINE message>}"""
+
+    __slots__ = ("payload",)
+
+    def __init__(self, payload: dict[str, Any]):
+        self.payload = payload
+
+
+class Context:
+    """The contexts of the request, and the output contexts set by the handler"""
+
+    __slots__ = ("contexts",)
+
+    def __init__(self, input_contexts: list[dict[str, Any]]):
+        # the input contexts are output again, as by dialogflow_fulfillment
+        self.contexts = {
+            context.get("name", "").rsplit("/", 1)[-1]: context
+            for context in input_contexts
+        }
+
+    def set(
+        self,
+        name: str,
+        lifespan_count: Optional[int] = None,
+        parameters: Optional[dict[str, Any]] = None,
+    ):
+        """Set a new context, or update the lifespan and parameters of a context"""
+        context = self.contexts.setdefault(name, {"name": name})
+        if lifespan_count is not None:
+            context["lifespanCount"] = lifespan_count
+        if parameters is not None:
+            context["parameters"] = parameters
+
+
+class WebhookClient:
+    """
+    A webhook request of Dialogflow ES (v2), and the response built by the handler.
+
+    It covers what the handlers used of `dialogflow_fulfillment.WebhookClient`, and
+    builds the same response, without processing the request up front: the fields
+    of the request are only read when they are accessed.
+    """
+
+    __slots__ = ("request", "messages", "_context")
+
+    def __init__(self, request: dict[str, Any]):
+        self.request = request
+        self.messages: list[dict[str, Any]] = []
+        self._context: Optional[Context] = None
+
+    @property
+    def intent(self) -> Optional[str]:
+        return self.request.get("queryResult", {}).get("intent", {}).get("displayName")
+
+    @property
+    def parameters(self) -> dict[str, Any]:
+        return self.request.get("queryResult", {}).get("parameters", {})
+
+    @property
+    def original_request(self) -> dict[str, Any]:
+        return self.request.get("originalDetectIntentRequest", {})
+
+    @property
+    def context(self) -> Context:
+        if self._context is None:
+            self._context = Context(
+                self.request.get("queryResult", {}).get("outputContexts", [])
+            )
+        return self._context
+
+    def add(self, message: Union[str, Payload]):
+        """Add a text or a payload message to the response"""
+        if isinstance(message, Payload):
+            self.messages.append({"payload": dict(message.payload)})
+        else:
+            self.messages.append({"text": {"text": [message]}})
+
+    def handle_request(self, handler: dict[str, Callable[["WebhookClient"], Any]]):
+        """Call the handler of the intent of the request"""
+        handler_function = handler.get(self.intent)
+        if not callable(handler_function):
+            raise TypeError(f"No handler for the intent {self.intent}")
+        return handler_function(self)
+
+    @property
+    def response(self) -> dict[str, Any]:
+        """The webhook response, as built by dialogflow_fulfillment"""
+        response: dict[str, Any] = {}
+        if self.messages:
+            response["fulfillmentMessages"] = self.messages
+        if self.context.contexts:
+            response["outputContexts"] = list(self.context.contexts.values())
+        source = self.original_request.get("source")
+        if source is not None:
+            response["source"] = source
+        return response
@@ -0,0 +1,52 @@
+import io
+from typing import Optional
+
+try:
+    from PIL import Image, ImageOps
+except ImportError as e:  # without Pillow the images are stored as they are
+    print("WARNING: Pillow is not available, images are not downscaled:", e)
+    Image = None
+
+# the longest side of the stored image, also large enough for Rekognition to read
+# small printed dates
+FULL_IMAGE_SIZE = 2048
+FULL_IMAGE_QUALITY = 85
+# the longest side of the image shown in the flex message bubbles
+THUMBNAIL_SIZE = 480
+THUMBNAIL_QUALITY = 75
+
+
+def resize_jpeg(image: bytes, max_size: int, quality: int) -> Optional[bytes]:
+    """
+    Return the image as a JPEG that fits in a max_size x max_size square, or None
+    when Pillow is not available.
+
+    The original image is returned when it is already a small enough JPEG that
+    re-encoding would not make smaller.
+    """
+    if Image is None:
+        return None
+
+    with Image.open(io.BytesIO(image)) as img:
+        image_format = img.format
+        original_size = img.size
+        # let the JPEG decoder scale the image down while decoding, which is much
+        # faster than decoding a full size photo
+        img.draft("RGB", (max_size, max_size))
+        # the EXIF orientation is lost when re-encoding, so apply it to the pixels
+        img = ImageOps.exif_transpose(img)
+        img.thumbnail((max_size, max_size))
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+
+        output = io.BytesIO()
+        img.save(output, "JPEG", quality=quality, optimize=True, progressive=True)
+
+    resized = output.getvalue()
+    if (
+        image_format == "JPEG"
+        and max(original_size) <= max_size
+        and len(image) <= len(resized)
+    ):
+        return image
+    return resized
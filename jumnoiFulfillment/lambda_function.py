@@ -1,19 +1,49 @@
-import base64
+import functools
+import hashlib
 import json
+import math
 import os
 from datetime import date, datetime, timezone, timedelta
 import random
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Optional
 
 import boto3
-import requests
-import urllib3
-from date_detection import create_date, get_date_regex
-from dialogflow_fulfillment import Payload, WebhookClient
+import content_cache
+import detection_cache
+import flex_templates
+import idempotency
+import image_processing
+import line_content
+import line_messaging
+import memo_cache
+from date_detection import detect_dates
+from deadline import Deadline, defer, finish, is_deferred, run_deferred
+from deadline import tasks as deferred_tasks
+from dialogflow_webhook import Payload, WebhookClient
 
 LINE_ACCESS_TOKEN = os.getenv("LINE_ACCESS_TOKEN")
 BUCKET_NAME = os.getenv("BUCKET_NAME")
 BUCKET_REGION = os.getenv("BUCKET_REGION")
 TABLE_NAME = os.getenv("TABLE_NAME")
+# global secondary index of the table with 'userId' as the partition key and
+# 'expDate' as the sort key, see utils/create_user_index.py
+USER_INDEX_NAME = os.getenv("USER_INDEX_NAME", "userId-expDate-index")
+# upload the image to S3 before detecting the exp date, and let Rekognition read it
+# from there instead of sending the image bytes. The upload is deleted after the
+# detection, see detection_key.
+UPLOAD_FIRST = os.getenv("UPLOAD_FIRST", "false").lower() == "true"
+# filters of Rekognition DetectText, an empty value disables the filter.
+# TEXT_REGIONS_OF_INTEREST is a JSON list of Rekognition regions of interest.
+TEXT_MIN_CONFIDENCE = os.getenv("TEXT_MIN_CONFIDENCE", "70")
+TEXT_MIN_BOX_HEIGHT = os.getenv("TEXT_MIN_BOX_HEIGHT", "0.01")
+TEXT_REGIONS_OF_INTEREST = os.getenv("TEXT_REGIONS_OF_INTEREST", "")
+# the expected seconds of a push request, to decide whether the messages can be
+# pushed before the response to Dialogflow
+PUSH_TIME_ESTIMATE = float(os.getenv("PUSH_TIME_ESTIMATE", 0.5))
+# the least seconds in which the exp date of an image can be detected, below which
+# the detection is deferred without starting it, so it is not run twice
+DETECT_TIME_ESTIMATE = float(os.getenv("DETECT_TIME_ESTIMATE", 1.0))
 
 assert LINE_ACCESS_TOKEN is not None
 assert TABLE_NAME is not None
@@ -23,80 +53,312 @@ assert BUCKET_REGION is not None
 rekog_client = boto3.client("rekognition")
 dynamodb_client = boto3.client("dynamodb")
 s3_client = boto3.client("s3")
-date_regex = get_date_regex()
-http = urllib3.PoolManager()
+
+word_filter: dict[str, float] = {}
+if TEXT_MIN_CONFIDENCE:
+    word_filter["MinConfidence"] = float(TEXT_MIN_CONFIDENCE)
+if TEXT_MIN_BOX_HEIGHT:
+    word_filter["MinBoundingBoxHeight"] = float(TEXT_MIN_BOX_HEIGHT)
+text_filters: dict[str, Any] = {"WordFilter": word_filter} if word_filter else {}
+if TEXT_REGIONS_OF_INTEREST:
+    text_filters["RegionsOfInterest"] = json.loads(TEXT_REGIONS_OF_INTEREST)
+
+# the stored images are never changed, so CDNs and LINE clients can cache them
+IMAGE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# the size in bytes above which an image is streamed from LINE to S3 as it is,
+# instead of being read into memory and downscaled
+IMAGE_STREAM_THRESHOLD = int(os.getenv("IMAGE_STREAM_THRESHOLD", 5 * 1024 * 1024))
+
+# image id -> SHA-256 hex digest of the images uploaded to S3 by this container
+stored_images: dict[str, str] = {}
+# image id -> SHA-256 hex digest of the images uploaded for a running detection
+detection_uploads: dict[str, str] = {}
+
+
+def get_image(image_id: str) -> bytes:
+    """Get the image sent by the user from the content cache or the LINE Data API"""
+    # the exp label is read again by the detection retried without filters, or by
+    # the deferred detection when it runs on this container
+    image = content_cache.get(image_id)
+    if image is None:
+        image = line_content.get_content(image_id).content
+        content_cache.put(image_id, image)
+        print("LINE content connections", line_content.connection_stats())
+    return image
+
+
+def detection_key(image_id: str) -> str:
+    """
+    Return the key of an image uploaded for Rekognition. It is not the image
+    saved with the item, which is the product image, so it is deleted after the
+    detection.
+    """
+    return f"detect/{image_id}"
+
+
+def upload_for_detection(image_id: str) -> str:
+    """
+    Upload the image for Rekognition to read, once for all the detections of the
+    image, and return its SHA-256 hex digest
+    """
+    if image_id not in detection_uploads:
+        with line_content.get_content(image_id, stream=True) as response:
+            image_size, detection_uploads[image_id] = line_content.upload_content(
+                response, s3_client, BUCKET_NAME, detection_key(image_id)
+            )
+        print("content size", image_size)
+    return detection_uploads[image_id]
+
+
+def delete_detection_upload(image_id: str):
+    if detection_uploads.pop(image_id, None) is not None:
+        s3_client.delete_object(Bucket=BUCKET_NAME, Key=detection_key(image_id))
+
+
+def store_image(image_id: str) -> Optional[str]:
+    """
+    Store the image sent by the user and its thumbnail in S3 if they are not
+    stored yet, and return the SHA-256 hex digest of the image when it is known.
+
+    The image is compressed and downscaled to `FULL_IMAGE_SIZE`. An image larger
+    than `IMAGE_STREAM_THRESHOLD`, or any image without Pillow, is streamed from
+    LINE to S3 as it is and copied as the thumbnail: it is not held in memory,
+    but it is stored and shown at its full size.
+    """
+    if image_id in stored_images:
+        print("Image already stored")
+        return stored_images.get(image_id)
+
+    extra_args = {"ContentType": "image/jpeg", "CacheControl": IMAGE_CACHE_CONTROL}
+    # the image is cached when it was also sent to detect the exp date, which is
+    # not the case of the product image in the conversation
+    image = content_cache.get(image_id)
+    response = None
+    if image is None:
+        response = line_content.get_content(image_id, stream=True)
+        length = response.headers.get("Content-Length")
+        if (
+            image_processing.Image is not None
+            and length is not None
+            and int(length) <= IMAGE_STREAM_THRESHOLD
+        ):
+            with response:
+                image = response.content
+
+    if image is not None:
+        print("Image size:", len(image))
+        image_hash = hashlib.sha256(image).hexdigest()
+        full_image = image_processing.resize_jpeg(
+            image,
+            image_processing.FULL_IMAGE_SIZE,
+            image_processing.FULL_IMAGE_QUALITY,
+        )
+        full_image = full_image or image
+        thumbnail = image_processing.resize_jpeg(
+            full_image,
+            image_processing.THUMBNAIL_SIZE,
+            image_processing.THUMBNAIL_QUALITY,
+        )
+        print("Stored image size:", len(full_image))
+        s3_client.put_object(
+            Bucket=BUCKET_NAME, Key=image_id, Body=full_image, **extra_args
+        )
+        s3_client.put_object(
+            Bucket=BUCKET_NAME,
+            Key=flex_templates.thumbnail_key(image_id),
+            Body=thumbnail or full_image,
+            **extra_args,
+        )
+    else:
+        with response:
+            image_size, image_hash = line_content.upload_content(
+                response, s3_client, BUCKET_NAME, image_id, extra_args
+            )
+        print("Image size:", image_size)
+        s3_client.copy_object(
+            Bucket=BUCKET_NAME,
+            Key=flex_templates.thumbnail_key(image_id),
+            CopySource={"Bucket": BUCKET_NAME, "Key": image_id},
+        )
+    if response is not None:
+        print("LINE content connections", line_content.connection_stats())
+    stored_images[image_id] = image_hash
+    return image_hash
+
+
+def detect_text(
+    image_id: str, filters: Optional[dict[str, Any]] = None
+) -> list[dict[str, Any]]:
+    """
+    Detect the texts in the image with Rekognition, or reuse the detections of an
+    identical image from the detection cache.
+    """
+    if UPLOAD_FIRST:
+        image_hash = upload_for_detection(image_id)
+    else:
+        image_bytes = get_image(image_id)
+        print("content size", len(image_bytes))
+        image_hash = hashlib.sha256(image_bytes).hexdigest()
+
+    cache_key = image_hash
+    if filters:
+        cache_key += f":{json.dumps(filters, sort_keys=True)}"
+    detections = detection_cache.get(cache_key)
+
+    if detections is None:
+        if UPLOAD_FIRST:
+            image: dict[str, Any] = {
+                "S3Object": {"Bucket": BUCKET_NAME, "Name": detection_key(image_id)}
+            }
+        else:
+            # a downscaled image is smaller to send and still readable for OCR
+            image = {
+                "Bytes": image_processing.resize_jpeg(
+                    image_bytes,
+                    image_processing.FULL_IMAGE_SIZE,
+                    image_processing.FULL_IMAGE_QUALITY,
+                )
+                or image_bytes
+            }
+        kwargs: dict[str, Any] = {"Image": image}
+        if filters:
+            kwargs["Filters"] = filters
+        detections = rekog_client.detect_text(**kwargs)["TextDetections"]
+        detection_cache.put(cache_key, detections)
+    print("Detection cache", detection_cache.stats)
+    print("Text detections", len(detections))
+    return detections
 
 
 def save_handler(agent: WebhookClient):
     """Save item image to S3 and save meta-data to dynamodb"""
     print("Save handler")
     product_id = str(int(agent.parameters["productId"]))
-    exp_date = agent.parameters["expDate"]
+    exp_date = agent.parameters.get("expDate") or confirmed_exp_date(agent)
+    if not exp_date:
+        # "ใช่" sent before the exp date of a deferred image was pushed
+        set_deferred_exp_image_contexts(agent)
+        agent.add("กำลังอ่านวันหมดอายุจากรูป กรุณารอสักครู่")
+        return
     user_id = agent.original_request["payload"]["data"]["source"]["userId"]
     print("product_id", product_id)
     print("exp_date", exp_date)
     print("user_id", user_id)
 
-    item_key = {"expDate": {"S": exp_date}, "userId": {"S": user_id}}
-
-    get_item_res = dynamodb_client.get_item(
-        TableName=TABLE_NAME,
-        Key=item_key,
-    )
-    print(f"{get_item_res}")
-    if "Item" in get_item_res:
+    # ADD creates the item when it does not exist, so a single update is enough,
+    # and saving the same image again leaves the item unchanged. The image is
+    # uploaded to S3 at the same time.
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        store_future = executor.submit(store_image, product_id)
         res = dynamodb_client.update_item(
             TableName=TABLE_NAME,
-            Key=item_key,
-            UpdateExpression="ADD s3Url :u",
+            Key={"expDate": {"S": exp_date}, "userId": {"S": user_id}},
+            UpdateExpression="ADD s3Url :u, thumbnails :u",
             ExpressionAttributeValues={":u": {"SS": [product_id]}},
         )
         print("update item res", res)
-    else:
-        res = dynamodb_client.put_item(
-            TableName=TABLE_NAME,
-            Item=item_key
-            | {
-                "s3Url": {"SS": [product_id]},
-            },
-        )
-    image_data = requests.get(
-        f"https://api-data.line.me/v2/bot/message/{product_id}/content",
-        headers={"Authorization": f"Bearer {LINE_ACCESS_TOKEN}"},
-    )
-    print("Image size:", len(image_data.content))
-    s3_client.put_object(Bucket=BUCKET_NAME, Key=product_id, Body=image_data.content)
+        memo_cache.invalidate(user_id)
+        store_future.result()
     agent.add(f"บันทึกเรียบร้อย")
 
 
-def exp_image_handler(agent: WebhookClient):
+def find_exp_dates(image_id: str) -> list[date]:
+    """Detect the exp dates in the image, the most likely one first"""
+    bangkok_tz = timezone(timedelta(hours=7))
+    today = datetime.now(tz=bangkok_tz).date()
+    try:
+        detected_dates = detect_dates(detect_text(image_id, text_filters), today=today)
+        # the filters may remove a small or blurry date, so retry without them
+        if not detected_dates and text_filters:
+            print("No date found with the filters, retry without filters")
+            detected_dates = detect_dates(detect_text(image_id), today=today)
+    finally:
+        delete_detection_upload(image_id)
+    return detected_dates
+
+
+def set_no_exp_date_contexts(agent: WebhookClient):
+    """Let the user send the exp date as a text or another image"""
+    agent.context.set(
+        "noteexp-product-followup",
+        lifespan_count=1,
+    )
+    agent.context.set(
+        "note-process",
+        lifespan_count=1,
+    )
+
+
+def set_deferred_exp_image_contexts(agent: WebhookClient):
+    """
+    Let the user confirm the exp date pushed by exp_image_task, or send the exp
+    date as a text or another image
+    """
+    set_no_exp_date_contexts(agent)
+    agent.context.set(
+        "noteexp-expimage-followup",
+        lifespan_count=1,
+    )
+
+
+def confirmed_exp_date(agent: WebhookClient) -> Optional[str]:
+    """Return the exp date confirmed with the postback of exp_image_task"""
+    postback = agent.original_request["payload"]["data"].get("postback", {})
+    data = postback.get("data", "")
+    if data.startswith(line_messaging.CONFIRM_POSTBACK_PREFIX):
+        return data[len(line_messaging.CONFIRM_POSTBACK_PREFIX) :]
+    return None
+
+
+def no_exp_date_message() -> dict[str, Any]:
+    return {
+        "type": "text",
+        "text": "ไม่พบวันหมดอายุในรูป กรุณาส่งรูปหรือข้อความแสดงวันหมดอายุอีกครั้ง",
+        "quickReply": {
+            "items": [
+                {
+                    "action": {"type": "camera", "label": "ถ่ายรูป"},
+                    "type": "action",
+                },
+                {
+                    "action": {
+                        "type": "cameraRoll",
+                        "label": "เลือกรูป",
+                    },
+                    "type": "action",
+                },
+                {
+                    "action": {
+                        "type": "datetimepicker",
+                        "data": "date",
+                        "label": "เลือกวัน",
+                        "mode": "date",
+                    },
+                    "type": "action",
+                },
+            ]
+        },
+    }
+
+
+def exp_image_handler(agent: WebhookClient, deadline: Deadline):
     """Detect the exp date from the image"""
     print("Exp image handler")
 
     image_id = agent.original_request["payload"]["data"]["message"]["id"]
     print(f"{image_id}")
-    image_data = requests.get(
-        f"https://api-data.line.me/v2/bot/message/{image_id}/content",
-        headers={"Authorization": f"Bearer {LINE_ACCESS_TOKEN}"},
-    )
-    print("content size", len(image_data.content))
-    image = base64.decodebytes(base64.b64encode(image_data.content))
-
-    res = rekog_client.detect_text(Image={"Bytes": image})
-    detected_dates: list[date] = []
-    for text in res["TextDetections"]:
-        # remove all whitespaces from the testing string
-        detected_text = "".join(text["DetectedText"].split())
-        result = date_regex.match(detected_text)
-        if result is not None:
-            capture_groups = result.groups()
-            detected_date = create_date(
-                capture_groups[0], capture_groups[2], capture_groups[3]
-            )
-            if detected_date is not None:
-                detected_dates.append(detected_date)
-
-    detected_dates.sort(reverse=True)
+    if deadline.remaining() < DETECT_TIME_ESTIMATE:
+        done, detected_dates = False, None
+    else:
+        done, detected_dates = deadline.run(find_exp_dates, image_id, key=image_id)
+    if not done:
+        # the exp date is pushed when it is detected, and confirming it saves the
+        # item as for an exp date detected in time
+        user_id = agent.original_request["payload"]["data"]["source"]["userId"]
+        defer("exp_image", {"imageId": image_id, "userId": user_id})
+        set_deferred_exp_image_contexts(agent)
+        agent.add("กำลังอ่านวันหมดอายุจากรูป กรุณารอสักครู่")
+        return
 
     try:
         exp_date = detected_dates[0]
@@ -136,48 +398,47 @@ def exp_image_handler(agent: WebhookClient):
             )
         )
     except IndexError:
-        agent.context.set(
-            "noteexp-product-followup",
-            lifespan_count=1,
-        )
-        agent.context.set(
-            "note-process",
-            lifespan_count=1,
-        )
-        agent.add(
-            Payload(
+        set_no_exp_date_contexts(agent)
+        agent.add(Payload({"line": no_exp_date_message()}))
+
+
+def exp_image_task(payload: dict[str, Any]):
+    """Detect the exp date of an image deferred by exp_image_handler and push it"""
+    image_id = payload["imageId"]
+    # the detection may still be running on this instance since exp_image_handler
+    detected_dates = finish(image_id, find_exp_dates, image_id)
+    if not detected_dates:
+        line_messaging.push_messages(payload["userId"], [no_exp_date_message()])
+        return
+
+    exp_date = detected_dates[0]
+    msg = {
+        "type": "text",
+        "text": f"วันหมดอายุของสินค้าคือวันที่ {exp_date.strftime('%d %B %Y')} ใช่หรือไม่",
+        "quickReply": {
+            "items": [
                 {
-                    "line": {
-                        "type": "text",
-                        "text": "ไม่พบวันหมดอายุในรูป กรุณาส่งรูปหรือข้อความแสดงวันหมดอายุอีกครั้ง",
-                        "quickReply": {
-                            "items": [
-                                {
-                                    "action": {"type": "camera", "label": "ถ่ายรูป"},
-                                    "type": "action",
-                                },
-                                {
-                                    "action": {
-                                        "type": "cameraRoll",
-                                        "label": "เลือกรูป",
-                                    },
-                                    "type": "action",
-                                },
-                                {
-                                    "action": {
-                                        "type": "datetimepicker",
-                                        "data": "date",
-                                        "label": "เลือกวัน",
-                                        "mode": "date",
-                                    },
-                                    "type": "action",
-                                },
-                            ]
-                        },
-                    }
-                }
-            )
-        )
+                    "type": "action",
+                    "action": {
+                        "type": "postback",
+                        "label": "ใช่",
+                        "data": f"{line_messaging.CONFIRM_POSTBACK_PREFIX}{exp_date}",
+                        "displayText": "ใช่",
+                    },
+                },
+                {
+                    "type": "action",
+                    "action": {
+                        "type": "datetimepicker",
+                        "data": "date",
+                        "label": "เลือกวัน",
+                        "mode": "date",
+                    },
+                },
+            ]
+        },
+    }
+    line_messaging.push_messages(payload["userId"], [msg])
 
 
 def exp_text_handler(agent: WebhookClient):
@@ -220,7 +481,33 @@ def exp_text_handler(agent: WebhookClient):
     )
 
 
-def get_memo_custom_handler(agent: WebhookClient):
+def query_user_items(user_id: str, start: str, end: str) -> list[dict[str, Any]]:
+    """Get the items of the user with an exp date between start and end"""
+    kwargs: dict[str, Any] = {
+        "TableName": TABLE_NAME,
+        "IndexName": USER_INDEX_NAME,
+        "KeyConditionExpression": "userId = :userId AND expDate BETWEEN :start AND :end",
+        "ProjectionExpression": "expDate, s3Url, thumbnails",
+        "ExpressionAttributeValues": {
+            ":userId": {"S": user_id},
+            ":start": {"S": start},
+            ":end": {"S": end},
+        },
+    }
+    items = []
+    # a page of the results holds at most 1 MB of items
+    while True:
+        res = dynamodb_client.query(**kwargs)
+        items.extend(res.get("Items", []))
+        if "LastEvaluatedKey" not in res:
+            return items
+        kwargs["ExclusiveStartKey"] = res["LastEvaluatedKey"]
+
+
+def memo_messages(
+    user_id: str, exp_date: date, today: date
+) -> list[line_messaging.Message]:
+    """Build the messages of the items of the user that expire by exp_date"""
     colors = [
         "#03303A",
         "#FF6B6E",
@@ -232,27 +519,24 @@ def get_memo_custom_handler(agent: WebhookClient):
     ]
     random.shuffle(colors)
 
-    bangkok_tz = timezone(timedelta(hours=7))
-    today = datetime.now(tz=bangkok_tz).date()
-
-    exp_date = datetime.fromisoformat(agent.parameters["expDate"]).date()
-    user_id = agent.original_request["payload"]["data"]["source"]["userId"]
-
-    dynamodb_response = dynamodb_client.scan(
-        TableName=TABLE_NAME,
-        FilterExpression="userId = :userId AND expDate >= :today AND expDate <= :expDate",
-        ExpressionAttributeValues={
-            ":userId": {"S": user_id},
-            ":expDate": {"S": str(exp_date)},
-            ":today": {"S": str(today)},
-        },
-    )
-
-    items = dynamodb_response.get("Items", [])
+    # a date in the past makes an empty range, which DynamoDB rejects
+    if exp_date < today:
+        items = []
+    else:
+        items = query_user_items(user_id, str(today), str(exp_date))
     all_data = [
-        (url, item.get("expDate", {}).get("S"), colors[i % len(colors)])
+        (
+            flex_templates.image_url(
+                BUCKET_NAME,
+                BUCKET_REGION,
+                image_id,
+                item.get("thumbnails", {}).get("SS", []),
+            ),
+            item.get("expDate", {}).get("S"),
+            colors[i % len(colors)],
+        )
         for i, item in enumerate(items)
-        for url in item.get("s3Url", {}).get("SS", [])
+        for image_id in item.get("s3Url", {}).get("SS", [])
     ]
     all_data.sort(key=lambda x: x[1])
 
@@ -261,112 +545,110 @@ def get_memo_custom_handler(agent: WebhookClient):
             "type": "text",
             "text": f"คุณไม่มีสินค้าที่กำลังจะหมดอายุภายในวันที่ {exp_date.strftime('%d %B %Y')}",
         }
-        push_message(user_id, msg)
-        return
+        return [msg]
 
     msg = {
         "type": "text",
         "text": f"คุณมีสินค้าที่กำลังจะหมดอายุภายในวันที่ {exp_date.strftime('%d %B %Y')} จำนวน {len(all_data)} รายการ",
     }
-    push_message(user_id, msg)
+    bubbles = [
+        flex_templates.EXPIRY_BUBBLE.render(
+            url=url,
+            text=f"วันหมดอายุ: {date.fromisoformat(exp_date_text).strftime('%d %B %Y')}",
+            color=color,
+        )
+        for (url, exp_date_text, color) in all_data
+    ]
+    return [msg, *flex_templates.carousel_messages(bubbles)]
+
+
+def cached_memo_messages(
+    user_id: str, exp_date: date, today: date
+) -> list[line_messaging.Message]:
+    """Return the memo messages from the memo cache, or build and cache them"""
+    messages = memo_cache.get(user_id, str(today), str(exp_date))
+    if messages is None:
+        messages = memo_messages(user_id, exp_date, today)
+        memo_cache.put(user_id, str(today), str(exp_date), messages)
+    print("Memo cache", memo_cache.stats)
+    return messages
+
+
+def push_memo(user_id: str, messages: list[line_messaging.Message]):
+    # the summary and the carousels are pushed in batches of 5 messages
+    batcher = line_messaging.MessageBatcher()
+    for msg in messages:
+        batcher.add(user_id, msg)
+    print("Delivery stats", batcher.flush())
 
-    # each carousel message can contain no more than 12 images
-    for i in range(0, len(all_data), 12):
-        msg = {
-            "type": "flex",
-            "altText": "รายการสินค้าใกล้หมดอายุ",
-            "contents": {
-                "type": "carousel",
-                "contents": [
-                    {
-                        "type": "bubble",
-                        "body": {
-                            "type": "box",
-                            "layout": "vertical",
-                            "contents": [
-                                {
-                                    "type": "image",
-                                    "url": f"https://{BUCKET_NAME}.s3.{BUCKET_REGION}.amazonaws.com/{url}",
-                                    "size": "full",
-                                },
-                                {
-                                    "type": "box",
-                                    "layout": "vertical",
-                                    "contents": [
-                                        {
-                                            "type": "box",
-                                            "layout": "vertical",
-                                            "contents": [
-                                                {"type": "filler"},
-                                                {
-                                                    "type": "box",
-                                                    "layout": "baseline",
-                                                    "contents": [
-                                                        {"type": "filler"},
-                                                        {
-                                                            "type": "text",
-                                                            "text": f"วันหมดอายุ: {datetime.strptime(exp_date_text, '%Y-%m-%d').date().strftime('%d %B %Y')}",
-                                                            "color": "#ffffff",
-                                                            "flex": 0,
-                                                            "weight": "bold",
-                                                            "align": "center",
-                                                            "size": "md",
-                                                        },
-                                                        {"type": "filler"},
-                                                    ],
-                                                    "spacing": "sm",
-                                                },
-                                                {"type": "filler"},
-                                            ],
-                                            "spacing": "sm",
-                                            "margin": "none",
-                                        }
-                                    ],
-                                    "position": "absolute",
-                                    "offsetBottom": "0px",
-                                    "offsetStart": "0px",
-                                    "offsetEnd": "0px",
-                                    "backgroundColor": color,
-                                    "justifyContent": "center",
-                                    "alignItems": "center",
-                                    "paddingTop": "10px",
-                                    "paddingBottom": "10px",
-                                },
-                            ],
-                            "paddingAll": "0px",
-                        },
-                    }
-                    for (url, exp_date_text, color) in all_data[i : i + 12]
-                ],
-            },
-        }
-        push_message(user_id, msg)
+
+def get_memo_custom_handler(agent: WebhookClient, deadline: Deadline):
+    bangkok_tz = timezone(timedelta(hours=7))
+    today = datetime.now(tz=bangkok_tz).date()
+
+    exp_date = datetime.fromisoformat(agent.parameters["expDate"]).date()
+    user_id = agent.original_request["payload"]["data"]["source"]["userId"]
+
+    messages = cached_memo_messages(user_id, exp_date, today)
+    push_requests = math.ceil(len(messages) / line_messaging.MAX_MESSAGES_PER_PUSH)
+    # the requests of a user are pushed one after the other
+    if push_requests * PUSH_TIME_ESTIMATE > deadline.remaining():
+        defer(
+            "get_memo",
+            {"userId": user_id, "expDate": str(exp_date), "today": str(today)},
+        )
+        agent.add("กำลังค้นหารายการสินค้า กรุณารอสักครู่")
+        return
+    push_memo(user_id, messages)
+
+
+def get_memo_task(payload: dict[str, Any]):
+    """Push the memo deferred by get_memo_custom_handler"""
+    messages = cached_memo_messages(
+        payload["userId"],
+        date.fromisoformat(payload["expDate"]),
+        date.fromisoformat(payload["today"]),
+    )
+    push_memo(payload["userId"], messages)
+
+
+deferred_tasks["exp_image"] = exp_image_task
+deferred_tasks["get_memo"] = get_memo_task
 
 
 def lambda_handler(event, context):
+    line_messaging.reset_retry_budget()
+    if is_deferred(event):
+        run_deferred(event)
+        return
+
+    deadline = Deadline(context)
     body = json.loads(event["body"])
     print(body)
+    # a LINE event redelivered through Dialogflow has the same webhook event id,
+    # and a webhook request retried by Dialogflow has the same response id
+    payload = body.get("originalDetectIntentRequest", {}).get("payload", {})
+    event_id = payload.get("data", {}).get("webhookEventId", body["responseId"])
+    event_id = f"fulfillment:{event_id}"
+    if not idempotency.claim(event_id):
+        print("Duplicate request", event_id)
+        print("Duplicate suppression rate", idempotency.suppression_rate())
+        return {}
 
     agent = WebhookClient(body)
     handler = {
-        "Note Exp - exp image": exp_image_handler,
+        "Note Exp - exp image": functools.partial(exp_image_handler, deadline=deadline),
         "Note Exp - exp text": exp_text_handler,
         "Note Exp - exp image - yes": save_handler,
-        "Get memo - start - custom": get_memo_custom_handler,
+        "Get memo - start - custom": functools.partial(
+            get_memo_custom_handler, deadline=deadline
+        ),
     }
-    agent.handle_request(handler)
+    try:
+        agent.handle_request(handler)
+    except Exception:
+        idempotency.release(event_id)
+        raise
+    print("Duplicate suppression rate", idempotency.suppression_rate())
 
     return agent.response
-
-
-def push_message(user_id, payload):
-    http.request(
-        "POST",
-        "https://api.line.me/v2/bot/message/push",
-        headers={
-            "Authorization": f"Bearer {LINE_ACCESS_TOKEN}",
-            "Content-Type": "application/json",
-        },
-        body=json.dumps({"to": user_id, "messages": [payload]}),
-        retries=False,
-    )
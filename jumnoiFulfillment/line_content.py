@@ -0,0 +1,91 @@
+import hashlib
+import os
+from typing import Any, Optional
+
+import requests
+from boto3.s3.transfer import TransferConfig
+from requests.adapters import HTTPAdapter
+
+LINE_ACCESS_TOKEN = os.getenv("LINE_ACCESS_TOKEN")
+LINE_DATA_API_URL = "https://api-data.line.me"
+
+# (connect, read) timeout in seconds
+TIMEOUT = (3.05, 10)
+# 5 MB is the smallest part of an S3 multipart upload. A part is uploaded while
+# the next one is downloaded, and at most (max_concurrency + 1) parts are held
+# in memory whatever the size of the content.
+TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=5 * 1024 * 1024,
+    multipart_chunksize=5 * 1024 * 1024,
+    max_concurrency=2,
+)
+
+# the session lives as long as the Lambda container, so a warm invocation reuses
+# the keep-alive connection to the LINE Data API instead of a new TLS handshake
+adapter = HTTPAdapter(pool_connections=1, pool_maxsize=4)
+session = requests.Session()
+session.mount(LINE_DATA_API_URL, adapter)
+session.headers["Authorization"] = f"Bearer {LINE_ACCESS_TOKEN}"
+
+
+def get_content(message_id: str, stream: bool = False) -> requests.Response:
+    """Get the content (e.g. image) of a message sent by the user"""
+    response = session.get(
+        f"{LINE_DATA_API_URL}/v2/bot/message/{message_id}/content",
+        timeout=TIMEOUT,
+        stream=stream,
+    )
+    response.raise_for_status()
+    return response
+
+
+class HashingReader:
+    """A file-like wrapper that counts and hashes the bytes read from a stream"""
+
+    def __init__(self, stream: Any):
+        self.stream = stream
+        self.size = 0
+        self.sha256 = hashlib.sha256()
+
+    def read(self, size: int = -1) -> bytes:
+        data = self.stream.read(size)
+        self.size += len(data)
+        self.sha256.update(data)
+        return data
+
+
+def upload_content(
+    response: requests.Response,
+    s3_client: Any,
+    bucket: str,
+    key: str,
+    extra_args: Optional[dict[str, str]] = None,
+) -> tuple[int, str]:
+    """
+    Stream the content of a message, got with `get_content(..., stream=True)`,
+    into an S3 object without holding the whole content in memory, and return the
+    size and the SHA-256 hex digest of the content.
+    """
+    response.raw.decode_content = True
+    reader = HashingReader(response.raw)
+    extra_args = dict(extra_args or {})
+    if "Content-Type" in response.headers:
+        extra_args["ContentType"] = response.headers["Content-Type"]
+    s3_client.upload_fileobj(
+        reader, bucket, key, ExtraArgs=extra_args, Config=TRANSFER_CONFIG
+    )
+    return reader.size, reader.sha256.hexdigest()
+
+
+def connection_stats() -> dict[str, int]:
+    """Return how many requests reused a connection and how many made a new one"""
+    requests_count = new_connections = 0
+    for key in adapter.poolmanager.pools.keys():
+        pool = adapter.poolmanager.pools[key]
+        requests_count += pool.num_requests
+        new_connections += pool.num_connections
+    return {
+        "requests": requests_count,
+        "new_connections": new_connections,
+        "reused_connections": requests_count - new_connections,
+    }
@@ -0,0 +1,38 @@
+import os
+import time
+from typing import Any, Optional
+
+import caching
+
+# the cache is per container, and save_handler only invalidates the cache of its
+# own container, so the TTL bounds how long another container shows stale memos
+MEMO_CACHE_TTL = float(os.getenv("MEMO_CACHE_TTL", 60))
+MAX_USERS = int(os.getenv("MEMO_CACHE_SIZE", 256))
+
+# user id -> (start date, end date) -> (expiry time, messages)
+entries: "caching.LRUCache[str, dict[tuple[str, str], tuple[float, list[Any]]]]" = (
+    caching.LRUCache(MAX_USERS)
+)
+stats = {"hits": 0, "misses": 0}
+
+
+def get(user_id: str, start: str, end: str) -> Optional[list[dict[str, Any]]]:
+    """Return the cached memo messages of the user for the date range, or None"""
+    expires_at, messages = entries.get(user_id, {}).get((start, end), (0.0, None))
+    if messages is None or expires_at <= time.monotonic():
+        stats["misses"] += 1
+        return None
+    stats["hits"] += 1
+    return messages
+
+
+def put(user_id: str, start: str, end: str, messages: list[dict[str, Any]]):
+    """Cache the memo messages of the user for the date range"""
+    user_entries = entries.get(user_id, {})
+    user_entries[(start, end)] = (time.monotonic() + MEMO_CACHE_TTL, messages)
+    entries.put(user_id, user_entries)
+
+
+def invalidate(user_id: str):
+    """Forget the cached memos of the user, after the items of the user changed"""
+    entries.pop(user_id, None)
@@ -0,0 +1,53 @@
+import importlib
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+
+class TestContentCache(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.cache = self.load_cache()
+
+    def load_cache(self):
+        env = {
+            "CONTENT_CACHE_DIR": self.cache_dir.name,
+            "CONTENT_CACHE_MAX_BYTES": "10",
+        }
+        with mock.patch.dict(os.environ, env):
+            import content_cache
+
+            return importlib.reload(content_cache)
+
+    def tearDown(self):
+        self.cache_dir.cleanup()
+
+    def test_get_put(self):
+        self.assertIsNone(self.cache.get("1"))
+        self.cache.put("1", b"abc")
+        self.assertEqual(self.cache.get("1"), b"abc")
+
+    def test_evict_least_recently_used(self):
+        self.cache.put("1", b"1234")
+        self.cache.put("2", b"1234")
+        self.cache.get("1")
+        self.cache.put("3", b"1234")
+        self.assertEqual(self.cache.get("1"), b"1234")
+        self.assertIsNone(self.cache.get("2"))
+        self.assertEqual(self.cache.get("3"), b"1234")
+        self.assertEqual(self.cache.entries.total_size, 8)
+
+    def test_too_large(self):
+        self.cache.put("1", b"12345678901")
+        self.assertIsNone(self.cache.get("1"))
+
+    def test_load_previous_files(self):
+        self.cache.put("1", b"1234")
+        cache = self.load_cache()
+        self.assertEqual(cache.get("1"), b"1234")
+        self.assertEqual(cache.entries.total_size, 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,7 +2,16 @@ import unittest
 from datetime import date
 from typing import Optional
 
-from date_detection import create_date, get_date_regex
+import date_pattern
+from date_detection import (
+    build_date_pattern,
+    build_month_number,
+    create_date,
+    detect_dates,
+    find_dates,
+    get_date_regex,
+    normalize_ocr_text,
+)
 
 
 class TestDetectExpDate(unittest.TestCase):
@@ -32,11 +41,191 @@ class TestDetectExpDate(unittest.TestCase):
         self.assert_detect_date("9Jan2020", day=9, month=1, year=2020)
         self.assert_detect_date("20221220", day=20, month=12, year=2022)
 
+    def test_thai_month(self):
+        self.assert_detect_date("15มกราคม2566", day=15, month=1, year=2023)
+        self.assert_detect_date("15ม.ค.66", day=15, month=1, year=2023)
+        self.assert_detect_date("1ธค2565", day=1, month=12, year=2022)
+
     def test_not_detect_date(self):
         self.assert_not_detect_date("asd23423")
         self.assert_not_detect_date("15-15-2022")
         self.assert_not_detect_date("9-12/2023")
 
 
+class TestDatePattern(unittest.TestCase):
+    def test_frozen_pattern_up_to_date(self):
+        """Run utils/freeze_date_pattern.py when this test fails"""
+        self.assertEqual(date_pattern.DATE_PATTERN, build_date_pattern())
+        self.assertEqual(date_pattern.MONTH_NUMBER, build_month_number())
+
+
+class TestNormalizeOcrText(unittest.TestCase):
+    def test_confused_digits(self):
+        self.assertEqual(normalize_ocr_text("EXP l5/I2/2O22"), "EXP 15/12/2022")
+        self.assertEqual(normalize_ocr_text("2S-O6-2O22"), "25-06-2022")
+
+    def test_thai_digits(self):
+        self.assertEqual(normalize_ocr_text("๑๕/๑๒/๒๕๖๕"), "15/12/2565")
+
+    def test_words_kept(self):
+        self.assertEqual(normalize_ocr_text("BEST BEFORE"), "BEST BEFORE")
+        self.assertEqual(normalize_ocr_text("15OCT2O22"), "15OCT2022")
+        self.assertEqual(normalize_ocr_text("SEP 2022"), "SEP 2022")
+        self.assertEqual(normalize_ocr_text("OIL"), "OIL")
+        self.assertEqual(normalize_ocr_text("SOLD"), "SOLD")
+        self.assertEqual(normalize_ocr_text("OIL 500ml"), "OIL 500ml")
+
+
+class TestFindDates(unittest.TestCase):
+    def assert_find_dates(
+        self,
+        input: str,
+        *expected: tuple[date, int, int],
+        word_starts: frozenset[int] = frozenset(),
+    ):
+        self.assertEqual(
+            [
+                (match.value, match.start, match.end)
+                for match in find_dates(input, word_starts=word_starts)
+            ],
+            list(expected),
+        )
+
+    def test_prefix(self):
+        self.assert_find_dates("EXP:15/12/2022", (date(2022, 12, 15), 4, 14))
+        self.assert_find_dates("BBE15/12/2022", (date(2022, 12, 15), 3, 13))
+
+    def test_multiple_dates(self):
+        self.assert_find_dates(
+            "MFG01/01/2022EXP01/01/2023",
+            (date(2022, 1, 1), 3, 13),
+            (date(2023, 1, 1), 16, 26),
+        )
+
+    def test_no_nested_dates(self):
+        self.assert_find_dates("20221220", (date(2022, 12, 20), 0, 8))
+
+    def test_word_starts(self):
+        self.assert_find_dates("15/12/20221")
+        self.assert_find_dates(
+            "15/12/20221", (date(2022, 12, 15), 0, 10), word_starts=frozenset([10])
+        )
+
+    def test_no_date(self):
+        self.assert_find_dates("asd23423")
+        self.assert_find_dates("LOT-15-15")
+
+
+class TestDetectDates(unittest.TestCase):
+    today = date(2022, 6, 1)
+
+    @staticmethod
+    def detection(text: str, id: int, confidence=99.0, left=0.1, top=0.1, **kwargs):
+        return {
+            "DetectedText": text,
+            "Type": "LINE",
+            "Id": id,
+            "Confidence": confidence,
+            "Geometry": {
+                "BoundingBox": {"Width": 0.2, "Height": 0.05, "Left": left, "Top": top}
+            },
+        } | kwargs
+
+    def assert_detect_dates(self, detections: list[dict], *expected: date):
+        self.assertEqual(detect_dates(detections, today=self.today), list(expected))
+
+    def test_words_of_line_not_searched_again(self):
+        detections = [
+            self.detection("EXP 15/12/2022", 0),
+            self.detection("EXP", 1, Type="WORD", ParentId=0),
+            self.detection("15/12/2022", 2, Type="WORD", ParentId=0),
+            self.detection("01/07/2022", 3, Type="WORD", ParentId=9),
+        ]
+        self.assert_detect_dates(detections, date(2022, 12, 15), date(2022, 7, 1))
+
+    def test_date_followed_by_number(self):
+        detections = [
+            self.detection("EXP 15.12.2022 13:45", 0),
+            self.detection("EXP", 1, Type="WORD", ParentId=0),
+            self.detection("15.12.2022", 2, Type="WORD", ParentId=0),
+            self.detection("13:45", 3, Type="WORD", ParentId=0),
+        ]
+        self.assert_detect_dates(detections, date(2022, 12, 15))
+        self.assert_detect_dates([self.detection("15/12/22 1", 0)], date(2022, 12, 15))
+        # a date stitched across detections ends at the join
+        self.assert_detect_dates(
+            [
+                self.detection("15/12/", 0, left=0.1),
+                self.detection("2022 13:45", 1, left=0.31),
+            ],
+            date(2022, 12, 15),
+        )
+
+    def test_keyword_in_text(self):
+        self.assert_detect_dates(
+            [self.detection("EXP 01/07/2022 MFG 01/12/2022", 0)],
+            date(2022, 7, 1),
+            date(2022, 12, 1),
+        )
+        self.assert_detect_dates(
+            [self.detection("หมดอายุ 01/07/2022", 0), self.detection("01/12/2022", 1)],
+            date(2022, 7, 1),
+            date(2022, 12, 1),
+        )
+
+    def test_nearest_keyword(self):
+        detections = [
+            self.detection("MFG", 0, top=0.1),
+            self.detection("01/12/2022", 1, top=0.15),
+            self.detection("EXP", 2, top=0.6),
+            self.detection("01/07/2022", 3, top=0.65),
+        ]
+        self.assert_detect_dates(detections, date(2022, 7, 1), date(2022, 12, 1))
+
+    def test_confidence(self):
+        detections = [
+            self.detection("01/12/2022", 0, confidence=60.0),
+            self.detection("01/07/2022", 1, confidence=99.0),
+        ]
+        self.assert_detect_dates(detections, date(2022, 7, 1), date(2022, 12, 1))
+
+    def test_implausible_date(self):
+        detections = [
+            self.detection("01/07/2022", 0),
+            self.detection("01/01/2022", 1),
+            self.detection("01/01/2099", 2),
+        ]
+        self.assert_detect_dates(
+            detections, date(2022, 7, 1), date(2099, 1, 1), date(2022, 1, 1)
+        )
+
+    def test_split_date(self):
+        self.assert_detect_dates(
+            [
+                self.detection("EXP 15 DEC", 0, top=0.5),
+                self.detection("2022", 1, top=0.56),
+            ],
+            date(2022, 12, 15),
+        )
+        self.assert_detect_dates(
+            [
+                self.detection("15/12/", 0, left=0.1),
+                self.detection("2022", 1, left=0.31),
+            ],
+            date(2022, 12, 15),
+        )
+
+    def test_far_tokens_not_stitched(self):
+        self.assert_detect_dates(
+            [
+                self.detection("15 DEC", 0, top=0.1),
+                self.detection("2022", 1, top=0.8),
+            ]
+        )
+
+    def test_no_detection(self):
+        self.assert_detect_dates([])
+
+
 if __name__ == "__main__":
     unittest.main()
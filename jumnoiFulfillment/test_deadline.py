@@ -0,0 +1,86 @@
+import threading
+import unittest
+from unittest import mock
+
+import deadline
+
+
+class FakeContext:
+    def __init__(self, remaining_ms: int):
+        self.remaining_ms = remaining_ms
+
+    def get_remaining_time_in_millis(self) -> int:
+        return self.remaining_ms
+
+
+@mock.patch.object(deadline, "RESPONSE_MARGIN", 1.0)
+class TestDeadline(unittest.TestCase):
+    def test_remaining(self):
+        self.assertAlmostEqual(deadline.Deadline(timeout=5).remaining(), 4, places=1)
+
+    def test_remaining_lambda_timeout(self):
+        context = FakeContext(remaining_ms=3000)
+        self.assertAlmostEqual(
+            deadline.Deadline(context, timeout=5).remaining(), 2, places=1
+        )
+
+    def test_run(self):
+        done, result = deadline.Deadline(timeout=5).run(sum, [1, 2])
+        self.assertTrue(done)
+        self.assertEqual(result, 3)
+
+    def test_run_past_deadline(self):
+        event = threading.Event()
+        done, result = deadline.Deadline(timeout=1.05).run(event.wait, 1)
+        event.set()
+        self.assertFalse(done)
+        self.assertIsNone(result)
+
+    def test_finish(self):
+        event = threading.Event()
+        with mock.patch.object(deadline, "unfinished", deadline.caching.LRUCache(2)):
+            done, _ = deadline.Deadline(timeout=1.05).run(event.wait, 1, key="key")
+            self.assertFalse(done)
+            event.set()
+            # the unfinished call is waited for instead of calling it again
+            func = mock.Mock()
+            self.assertTrue(deadline.finish("key", func))
+            func.assert_not_called()
+            self.assertEqual(deadline.finish("key", sum, [1, 2]), 3)
+
+    def test_unfinished_bound(self):
+        event = threading.Event()
+        with mock.patch.object(deadline, "unfinished", deadline.caching.LRUCache(2)):
+            for key in "abc":
+                deadline.Deadline(timeout=1.05).run(event.wait, 1, key=key)
+            event.set()
+            # the oldest is forgotten when its deferred work ran elsewhere
+            self.assertEqual(list(deadline.unfinished), ["b", "c"])
+
+    def test_run_error(self):
+        with self.assertRaises(ZeroDivisionError):
+            deadline.Deadline(timeout=5).run(lambda: 1 / 0)
+
+
+@mock.patch.object(deadline, "DEFER_MODE", "local")
+class TestDefer(unittest.TestCase):
+    def test_defer(self):
+        event = threading.Event()
+        payloads = []
+
+        def task(payload):
+            payloads.append(payload)
+            event.set()
+
+        with mock.patch.dict(deadline.tasks, {"task": task}):
+            deadline.defer("task", {"a": 1})
+            self.assertTrue(event.wait(1))
+        self.assertEqual(payloads, [{"a": 1}])
+
+    def test_is_deferred(self):
+        self.assertTrue(deadline.is_deferred({"deferredTask": "task", "payload": {}}))
+        self.assertFalse(deadline.is_deferred({"body": "{}"}))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+import json
+import time
+import unittest
+import zlib
+from unittest import mock
+
+import detection_cache
+
+DETECTIONS = [{"DetectedText": "EXP 20/06/2022", "Type": "LINE"}]
+
+
+class ClientError(Exception):
+    pass
+
+
+def item(expires_at: float) -> dict:
+    return {
+        "Item": {
+            "imageHash": {"S": "a"},
+            "detections": {"B": zlib.compress(json.dumps(DETECTIONS).encode())},
+            "expiresAt": {"N": str(int(expires_at))},
+        }
+    }
+
+
+class TestDetectionCache(unittest.TestCase):
+    def setUp(self):
+        self.dynamodb_client = mock.Mock()
+        self.dynamodb_client.get_item.return_value = {}
+        self.dynamodb_client.exceptions.ClientError = ClientError
+        patcher = mock.patch.multiple(
+            detection_cache,
+            DETECTION_CACHE_TABLE="table",
+            dynamodb_client=self.dynamodb_client,
+            memory=detection_cache.caching.LRUCache(2),
+            stats={"memory_hits": 0, "table_hits": 0, "misses": 0, "table_errors": 0},
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_memory_hit(self):
+        detection_cache.put("a", DETECTIONS)
+        self.assertEqual(detection_cache.get("a"), DETECTIONS)
+        self.dynamodb_client.get_item.assert_not_called()
+        put_item = self.dynamodb_client.put_item.call_args.kwargs["Item"]
+        self.assertEqual(put_item["imageHash"], {"S": "a"})
+        self.assertEqual(
+            json.loads(zlib.decompress(put_item["detections"]["B"])), DETECTIONS
+        )
+
+    def test_memory_limit(self):
+        for key in "abc":
+            detection_cache.put(key, DETECTIONS)
+        # the least recently used image is evicted
+        detection_cache.get("b")
+        detection_cache.put("d", DETECTIONS)
+        self.assertEqual(list(detection_cache.memory), ["b", "d"])
+
+    def test_table_hit(self):
+        self.dynamodb_client.get_item.return_value = item(time.time() + 60)
+        self.assertEqual(detection_cache.get("a"), DETECTIONS)
+        # the detections are kept in memory
+        self.assertEqual(detection_cache.get("a"), DETECTIONS)
+        self.dynamodb_client.get_item.assert_called_once()
+
+    def test_table_expired(self):
+        self.dynamodb_client.get_item.return_value = item(time.time() - 60)
+        self.assertIsNone(detection_cache.get("a"))
+        self.assertNotIn("a", detection_cache.memory)
+
+    def test_stats(self):
+        detection_cache.put("a", DETECTIONS)
+        detection_cache.get("a")
+        detection_cache.get("b")
+        self.dynamodb_client.get_item.return_value = item(time.time() + 60)
+        detection_cache.get("c")
+        self.assertEqual(
+            detection_cache.stats,
+            {"memory_hits": 1, "table_hits": 1, "misses": 1, "table_errors": 0},
+        )
+
+    def test_table_errors(self):
+        self.dynamodb_client.get_item.side_effect = ClientError("throttled")
+        self.dynamodb_client.put_item.side_effect = ClientError("too large")
+        self.assertIsNone(detection_cache.get("a"))
+        detection_cache.put("a", DETECTIONS)
+        # the detections are still cached in memory
+        self.assertEqual(detection_cache.get("a"), DETECTIONS)
+        self.assertEqual(detection_cache.stats["table_errors"], 2)
+        self.assertEqual(detection_cache.stats["misses"], 1)
+
+    def test_without_table(self):
+        with mock.patch.object(detection_cache, "dynamodb_client", None):
+            self.assertIsNone(detection_cache.get("a"))
+            detection_cache.put("a", DETECTIONS)
+            self.assertEqual(detection_cache.get("a"), DETECTIONS)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+import copy
+import unittest
+
+from dialogflow_webhook import Payload, WebhookClient
+
+try:
+    import dialogflow_fulfillment
+except ImportError:
+    dialogflow_fulfillment = None
+
+SESSION = "projects/jumnoi/agent/sessions/1"
+REQUEST = {
+    "responseId": "response-1",
+    "session": SESSION,
+    "queryResult": {
+        "queryText": "15566151561",
+        "parameters": {"productId": 15566151561.0},
+        "intent": {
+            "name": "projects/jumnoi/agent/intents/1",
+            "displayName": "Note Exp - exp image",
+        },
+        "outputContexts": [
+            {
+                "name": f"{SESSION}/contexts/note-process",
+                "lifespanCount": 1,
+                "parameters": {"productId": 15566151561.0},
+            }
+        ],
+        "languageCode": "th",
+    },
+    "originalDetectIntentRequest": {
+        "source": "line",
+        "payload": {"data": {"source": {"userId": "U1"}, "type": "message"}},
+    },
+}
+
+
+def exp_image_handler(agent, payload_class=Payload):
+    agent.context.set(
+        "noteexp-expimage-followup",
+        lifespan_count=1,
+        parameters={"expDate": "2022-06-20"},
+    )
+    agent.context.set("note-process", lifespan_count=0)
+    agent.add("text")
+    agent.add(payload_class({"line": {"type": "text", "text": "payload"}}))
+
+
+class TestWebhookClient(unittest.TestCase):
+    def test_request(self):
+        agent = WebhookClient(copy.deepcopy(REQUEST))
+        self.assertEqual(agent.intent, "Note Exp - exp image")
+        self.assertEqual(agent.parameters, {"productId": 15566151561.0})
+        self.assertEqual(
+            agent.original_request["payload"]["data"]["source"]["userId"], "U1"
+        )
+
+    def test_response(self):
+        agent = WebhookClient(copy.deepcopy(REQUEST))
+        agent.handle_request({"Note Exp - exp image": exp_image_handler})
+        self.assertEqual(
+            agent.response,
+            {
+                "fulfillmentMessages": [
+                    {"text": {"text": ["text"]}},
+                    {"payload": {"line": {"type": "text", "text": "payload"}}},
+                ],
+                "outputContexts": [
+                    {
+                        "name": f"{SESSION}/contexts/note-process",
+                        "lifespanCount": 0,
+                        "parameters": {"productId": 15566151561.0},
+                    },
+                    {
+                        "name": "noteexp-expimage-followup",
+                        "lifespanCount": 1,
+                        "parameters": {"expDate": "2022-06-20"},
+                    },
+                ],
+                "source": "line",
+            },
+        )
+
+    def test_no_handler(self):
+        agent = WebhookClient(copy.deepcopy(REQUEST))
+        with self.assertRaises(TypeError):
+            agent.handle_request({})
+
+    @unittest.skipIf(dialogflow_fulfillment is None, "no dialogflow_fulfillment")
+    def test_same_response_as_dialogflow_fulfillment(self):
+        agent = WebhookClient(copy.deepcopy(REQUEST))
+        agent.handle_request({"Note Exp - exp image": exp_image_handler})
+
+        def fulfillment_handler(agent):
+            exp_image_handler(agent, dialogflow_fulfillment.Payload)
+
+        expected = dialogflow_fulfillment.WebhookClient(copy.deepcopy(REQUEST))
+        expected.handle_request({"Note Exp - exp image": fulfillment_handler})
+        self.assertEqual(agent.response, expected.response)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+import io
+import unittest
+
+import image_processing
+from image_processing import Image
+
+# the EXIF orientation of a photo taken with the camera turned 90 degrees clockwise
+ORIENTATION_TAG = 0x0112
+ROTATE_90_CW = 6
+
+
+def jpeg(size: tuple[int, int], quality: int, orientation: int = 1) -> bytes:
+    """An optimized JPEG with the left half red and the right half blue"""
+    img = Image.new("RGB", size, "blue")
+    img.paste("red", (0, 0, size[0] // 2, size[1]))
+    exif = Image.Exif()
+    exif[ORIENTATION_TAG] = orientation
+    output = io.BytesIO()
+    img.save(
+        output, "JPEG", quality=quality, optimize=True, progressive=True, exif=exif
+    )
+    return output.getvalue()
+
+
+@unittest.skipIf(Image is None, "no Pillow")
+class TestResizeJpeg(unittest.TestCase):
+    def test_resize(self):
+        resized = image_processing.resize_jpeg(jpeg((400, 200), 95), 100, 75)
+        with Image.open(io.BytesIO(resized)) as img:
+            self.assertEqual(img.format, "JPEG")
+            self.assertEqual(img.size, (100, 50))
+
+    def test_exif_rotation(self):
+        image = jpeg((400, 200), 95, orientation=ROTATE_90_CW)
+        resized = image_processing.resize_jpeg(image, 100, 75)
+        with Image.open(io.BytesIO(resized)) as img:
+            self.assertEqual(img.size, (50, 100))
+            # the left of the photo is at the top once turned
+            red, _, blue = img.convert("RGB").getpixel((25, 10))
+            self.assertGreater(red, blue)
+            self.assertEqual(img.getexif().get(ORIENTATION_TAG, 1), 1)
+
+    def test_small_jpeg_unchanged(self):
+        image = jpeg((100, 50), 30)
+        self.assertIs(image_processing.resize_jpeg(image, 480, 75), image)
+
+    def test_png(self):
+        output = io.BytesIO()
+        Image.new("RGBA", (100, 50)).save(output, "PNG")
+        resized = image_processing.resize_jpeg(output.getvalue(), 480, 75)
+        with Image.open(io.BytesIO(resized)) as img:
+            self.assertEqual((img.format, img.mode), ("JPEG", "RGB"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,177 @@
+import importlib.util
+import json
+import os
+import threading
+import unittest
+from unittest import mock
+
+import deadline
+from deadline import Deadline
+
+try:
+    import boto3
+except ImportError:
+    boto3 = None
+
+ENV = {
+    "LINE_ACCESS_TOKEN": "token",
+    "TABLE_NAME": "jumnoi",
+    "BUCKET_NAME": "jumnoi",
+    "BUCKET_REGION": "ap-southeast-1",
+    "AWS_DEFAULT_REGION": "ap-southeast-1",
+}
+if boto3 is not None:
+    with mock.patch.dict(os.environ, ENV):
+        import lambda_function
+
+PROXY_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "../jumnoiProxy/lambda_function.py"
+)
+
+
+def load_proxy():
+    """The lambda function of jumnoiProxy, which has the same module name"""
+    spec = importlib.util.spec_from_file_location("proxy_lambda_function", PROXY_PATH)
+    proxy = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(proxy)
+    return proxy
+
+
+def detection(text: str, id: int) -> dict:
+    return {
+        "DetectedText": text,
+        "Type": "LINE",
+        "Id": id,
+        "Confidence": 99.0,
+        "Geometry": {
+            "BoundingBox": {"Width": 0.2, "Height": 0.05, "Left": 0.1, "Top": 0.1}
+        },
+    }
+
+
+def webhook_request(intent: str, line_event: dict, parameters: dict) -> dict:
+    """The request of Dialogflow for a LINE event sent by jumnoiProxy"""
+    session = "projects/jumnoi/agent/sessions/1"
+    return {
+        "responseId": f"response-{line_event['webhookEventId']}",
+        "session": session,
+        "queryResult": {
+            "queryText": line_event["message"]["text"],
+            "parameters": parameters,
+            "intent": {"displayName": intent},
+            "outputContexts": [],
+        },
+        "originalDetectIntentRequest": {
+            "source": "line",
+            "payload": {"data": line_event},
+        },
+    }
+
+
+def context_names(response: dict) -> set[str]:
+    return {context["name"] for context in response.get("outputContexts", [])}
+
+
+@unittest.skipIf(boto3 is None, "no boto3")
+@mock.patch.object(deadline, "RESPONSE_MARGIN", 0.0)
+class TestDeferredExpImage(unittest.TestCase):
+    def setUp(self):
+        patches = [
+            mock.patch.object(lambda_function, "rekog_client"),
+            mock.patch.object(lambda_function, "dynamodb_client"),
+            mock.patch.object(lambda_function, "store_image"),
+            mock.patch.object(lambda_function, "defer"),
+            mock.patch.object(lambda_function, "get_image"),
+            mock.patch.object(lambda_function.image_processing, "resize_jpeg"),
+            mock.patch.object(lambda_function.line_messaging, "push_messages"),
+            mock.patch.object(lambda_function, "text_filters", {}),
+            mock.patch.object(lambda_function, "DETECT_TIME_ESTIMATE", 0.0),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        lambda_function.get_image.side_effect = lambda image_id: image_id.encode()
+        lambda_function.image_processing.resize_jpeg.return_value = None
+
+    def save(self, line_event: dict, parameters: dict) -> dict:
+        request = webhook_request("Note Exp - exp image - yes", line_event, parameters)
+        return lambda_function.lambda_handler({"body": json.dumps(request)}, None)
+
+    def test_confirm_pushed_exp_date(self):
+        # the detection is slower than the response to Dialogflow
+        detected = threading.Event()
+
+        def detect_text(**kwargs):
+            detected.wait(5)
+            return {"TextDetections": [detection("EXP 20/06/2030", 0)]}
+
+        lambda_function.rekog_client.detect_text.side_effect = detect_text
+        # jumnoiProxy sends the id of an image as the text of the message
+        image_event = {
+            "type": "message",
+            "message": {"type": "text", "id": "image-1", "text": "image-1"},
+            "source": {"userId": "U1"},
+            "webhookEventId": "event-1",
+        }
+        agent = lambda_function.WebhookClient(
+            webhook_request("Note Exp - exp image", image_event, {})
+        )
+        lambda_function.exp_image_handler(agent, Deadline(timeout=0.05))
+        lambda_function.defer.assert_called_once_with(
+            "exp_image", {"imageId": "image-1", "userId": "U1"}
+        )
+        self.assertIn("noteexp-expimage-followup", context_names(agent.response))
+
+        # the deferred task waits for the detection left running, and pushes it
+        detected.set()
+        lambda_function.exp_image_task(lambda_function.defer.call_args.args[1])
+        lambda_function.rekog_client.detect_text.assert_called_once()
+        user_id, (message,) = (
+            lambda_function.line_messaging.push_messages.call_args.args
+        )
+        self.assertEqual(user_id, "U1")
+        action = message["quickReply"]["items"][0]["action"]
+        self.assertEqual(action["data"], "confirm:2030-06-20")
+
+        # jumnoiProxy sends the postback of the confirmation to Dialogflow as "ใช่"
+        postback_event = {
+            "type": "postback",
+            "postback": {"data": action["data"]},
+            "source": {"userId": "U1"},
+            "webhookEventId": "event-2",
+        }
+        proxy = load_proxy()
+        with mock.patch.object(proxy, "dialogflow_handler") as dialogflow_handler:
+            proxy.handle_event({}, {"events": [postback_event]})
+        (line_event,) = dialogflow_handler.call_args.args[1]["events"]
+        self.assertEqual(line_event["message"]["text"], "ใช่")
+
+        response = self.save(line_event, {"productId": 15566151561.0})
+        lambda_function.dynamodb_client.update_item.assert_called_once()
+        key = lambda_function.dynamodb_client.update_item.call_args.kwargs["Key"]
+        self.assertEqual(key, {"expDate": {"S": "2030-06-20"}, "userId": {"S": "U1"}})
+        lambda_function.store_image.assert_called_once_with("15566151561")
+        self.assertEqual(
+            response["fulfillmentMessages"], [{"text": {"text": ["บันทึกเรียบร้อย"]}}]
+        )
+
+    def test_yes_before_push(self):
+        line_event = {
+            "type": "message",
+            "message": {"type": "text", "text": "ใช่"},
+            "source": {"userId": "U1"},
+            "webhookEventId": "event-3",
+        }
+        response = self.save(line_event, {"productId": 15566151561.0})
+        lambda_function.dynamodb_client.update_item.assert_not_called()
+        lambda_function.store_image.assert_not_called()
+        self.assertEqual(
+            response["fulfillmentMessages"],
+            [{"text": {"text": ["กำลังอ่านวันหมดอายุจากรูป กรุณารอสักครู่"]}}],
+        )
+        # the pushed exp date can still be confirmed
+        self.assertIn("noteexp-expimage-followup", context_names(response))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,47 @@
+import unittest
+from unittest import mock
+
+import memo_cache
+
+MESSAGES = [{"type": "text", "text": "memo"}]
+
+
+class TestMemoCache(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.multiple(
+            memo_cache,
+            entries=memo_cache.caching.LRUCache(2),
+            stats={"hits": 0, "misses": 0},
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_get_put(self):
+        self.assertIsNone(memo_cache.get("a", "2022-06-01", "2022-06-30"))
+        memo_cache.put("a", "2022-06-01", "2022-06-30", MESSAGES)
+        self.assertEqual(memo_cache.get("a", "2022-06-01", "2022-06-30"), MESSAGES)
+        self.assertIsNone(memo_cache.get("a", "2022-06-01", "2022-07-31"))
+        self.assertEqual(memo_cache.stats, {"hits": 1, "misses": 2})
+
+    def test_expired(self):
+        memo_cache.put("a", "2022-06-01", "2022-06-30", MESSAGES)
+        with mock.patch.object(memo_cache, "MEMO_CACHE_TTL", 0):
+            memo_cache.put("b", "2022-06-01", "2022-06-30", MESSAGES)
+        self.assertIsNotNone(memo_cache.get("a", "2022-06-01", "2022-06-30"))
+        self.assertIsNone(memo_cache.get("b", "2022-06-01", "2022-06-30"))
+
+    def test_invalidate(self):
+        memo_cache.put("a", "2022-06-01", "2022-06-30", MESSAGES)
+        memo_cache.put("a", "2022-06-01", "2022-07-31", MESSAGES)
+        memo_cache.invalidate("a")
+        self.assertIsNone(memo_cache.get("a", "2022-06-01", "2022-06-30"))
+        self.assertIsNone(memo_cache.get("a", "2022-06-01", "2022-07-31"))
+
+    def test_evict_least_recently_used(self):
+        for user_id in "abc":
+            memo_cache.put(user_id, "2022-06-01", "2022-06-30", MESSAGES)
+        self.assertEqual(list(memo_cache.entries), ["b", "c"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -5,7 +5,9 @@ import hmac
 import hashlib
 import os
 
-LINE_ACCESS_TOKEN = os.getenv("LINE_ACCESS_TOKEN")
+import idempotency
+import line_messaging
+
 DIALOGFLOW_URL = os.getenv("DIALOGFLOW_URL")
 CHANNEL_SECRET = os.getenv("CHANNEL_SECRET")
 
@@ -13,19 +15,38 @@ http = urllib3.PoolManager()
 
 
 def lambda_handler(event, context):
+    line_messaging.reset_retry_budget()
     headers = event["headers"]
     body = json.loads(event["body"])
     print(body)
+    # LINE redelivers an event when the webhook fails or times out
+    event_id = f"proxy:{body['events'][0]['webhookEventId']}"
+    if not idempotency.claim(event_id):
+        print("Duplicate event", event_id)
+    else:
+        try:
+            handle_event(headers, body)
+        except Exception:
+            idempotency.release(event_id)
+            raise
+    print("Duplicate suppression rate", idempotency.suppression_rate())
+
+    return {"statusCode": 200, "body": json.dumps("Done!")}
+
+
+def handle_event(headers, body):
     if body["events"][0]["type"] == "postback":
         body["events"] = body["events"][0:1]
         event_data = body["events"][0]["postback"]
+        text = event_data["data"]
+        if text == "date":
+            text = event_data["params"]["date"]
+        elif text.startswith(line_messaging.CONFIRM_POSTBACK_PREFIX):
+            # the confirmation of a pushed exp date, which jumnoiFulfillment reads
+            # from the postback kept in the event
+            text = "ใช่"
         body["events"][0]["type"] = "message"
-        body["events"][0]["message"] = {
-            "type": "text",
-            "text": event_data["params"]["date"]
-            if event_data["data"] == "date"
-            else event_data["data"],
-        }
+        body["events"][0]["message"] = {"type": "text", "text": text}
         dialogflow_handler(headers, body)
     else:
         message_type = body["events"][0]["message"]["type"]
@@ -44,8 +65,6 @@ def lambda_handler(event, context):
                 },
             )
 
-    return {"statusCode": 200, "body": json.dumps("Done!")}
-
 
 def dialogflow_handler(headers, body):
     print(body)
@@ -73,13 +92,4 @@ def to_json(data):
 
 
 def reply(token, payload):
-    http.request(
-        "POST",
-        "https://api.line.me/v2/bot/message/reply",
-        headers={
-            "Authorization": f"Bearer {LINE_ACCESS_TOKEN}",
-            "Content-Type": "application/json; charset=UTF-8",
-        },
-        body=json.dumps({"replyToken": token, "messages": [payload]}),
-        retries=False,
-    )
+    line_messaging.reply_messages(token, [payload])
@@ -0,0 +1,44 @@
+import unittest
+from unittest import mock
+
+import lambda_function
+
+
+def postback_body(data: str, params: dict = None) -> dict:
+    postback = {"data": data} | ({"params": params} if params else {})
+    return {
+        "events": [
+            {
+                "type": "postback",
+                "postback": postback,
+                "source": {"userId": "U1"},
+                "webhookEventId": "event-1",
+            }
+        ]
+    }
+
+
+@mock.patch.object(lambda_function, "dialogflow_handler")
+class TestHandleEvent(unittest.TestCase):
+    def test_confirm_postback(self, dialogflow_handler):
+        lambda_function.handle_event({}, postback_body("confirm:2022-06-20"))
+        event = dialogflow_handler.call_args.args[1]["events"][0]
+        self.assertEqual(event["type"], "message")
+        self.assertEqual(event["message"], {"type": "text", "text": "ใช่"})
+        # jumnoiFulfillment reads the confirmed date from the postback
+        self.assertEqual(event["postback"]["data"], "confirm:2022-06-20")
+
+    def test_date_postback(self, dialogflow_handler):
+        body = postback_body("date", {"date": "2022-06-20"})
+        lambda_function.handle_event({}, body)
+        event = dialogflow_handler.call_args.args[1]["events"][0]
+        self.assertEqual(event["message"], {"type": "text", "text": "2022-06-20"})
+
+    def test_other_postback(self, dialogflow_handler):
+        lambda_function.handle_event({}, postback_body("ไม่ใช่"))
+        event = dialogflow_handler.call_args.args[1]["events"][0]
+        self.assertEqual(event["message"], {"type": "text", "text": "ไม่ใช่"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+"""
+Measure the import time of `date_detection` in a fresh interpreter, as on a cold
+start of jumnoiFulfillment, against building and compiling the date regex at
+import time as before the pattern was frozen.
+"""
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+FUNCTION_DIR = Path(__file__).resolve().parent.parent / "jumnoiFulfillment"
+
+BUILD_AT_IMPORT = """
+from time import perf_counter
+start = perf_counter()
+import calendar, itertools, re
+import date_detection
+date_detection.build_month_number()
+re.compile(date_detection.build_date_pattern(), re.IGNORECASE)
+print(perf_counter() - start)
+"""
+
+FROZEN_IMPORT = """
+from time import perf_counter
+start = perf_counter()
+import date_detection
+print(perf_counter() - start)
+"""
+
+FIRST_USE_COMPILE = """
+import date_detection
+from time import perf_counter
+start = perf_counter()
+date_detection.get_date_regex()
+print(perf_counter() - start)
+"""
+
+
+def run(statement: str, repeat: int) -> float:
+    """Return the median time in ms of running the statement in a fresh interpreter"""
+    times = [
+        float(
+            subprocess.run(
+                [sys.executable, "-c", statement],
+                cwd=FUNCTION_DIR,
+                capture_output=True,
+                check=True,
+                text=True,
+            ).stdout
+        )
+        for _ in range(repeat)
+    ]
+    return statistics.median(times) * 1e3
+
+
+if __name__ == "__main__":
+    repeat = 20
+    print(f"build and compile at import: {run(BUILD_AT_IMPORT, repeat):.2f} ms")
+    print(f"frozen pattern import:       {run(FROZEN_IMPORT, repeat):.2f} ms")
+    print(f"deferred compile on use:     {run(FIRST_USE_COMPILE, repeat):.2f} ms")
@@ -0,0 +1,117 @@
+import random
+import sys
+from pathlib import Path
+from timeit import repeat
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "jumnoiFulfillment"))
+
+from date_detection import (  # noqa: E402
+    create_date,
+    detect_dates,
+    find_dates,
+    get_date_regex,
+)
+
+WORDS = ["EXP", "MFG", "LOT", "NET", "WT", "500g", "A12B3", "Thailand", "BBE"]
+DATES = ["15/12/2022", "2023-08-11", "9Jan2020", "28/07/19"]
+
+
+def create_box(left: float, top: float, width: float, height: float) -> dict:
+    return {
+        "BoundingBox": {"Width": width, "Height": height, "Left": left, "Top": top}
+    }
+
+
+def create_detections(line_count: int) -> list[dict]:
+    """Create a fake Rekognition `TextDetections` list with LINE and WORD detections"""
+    rng = random.Random(line_count)
+    # lines are laid out in 2 columns
+    height = 1.6 / line_count
+    lines, words = [], []
+    for line_id in range(line_count):
+        line_words = rng.choices(WORDS, k=rng.randint(2, 5))
+        if line_id % 10 == 0:
+            line_words.append(rng.choice(DATES))
+        left, top = 0.5 * (line_id % 2), height * (line_id // 2)
+        lines.append(
+            {
+                "DetectedText": " ".join(line_words),
+                "Type": "LINE",
+                "Id": line_id,
+                "Confidence": rng.uniform(80, 100),
+                "Geometry": create_box(left, top, 0.4, height * 0.8),
+            }
+        )
+        words.extend(
+            {
+                "DetectedText": word,
+                "Type": "WORD",
+                "Id": line_count + len(words),
+                "ParentId": line_id,
+                "Confidence": rng.uniform(80, 100),
+                "Geometry": create_box(left + 0.08 * idx, top, 0.07, height * 0.8),
+            }
+            for idx, word in enumerate(line_words)
+        )
+    return lines + words
+
+
+def detect_dates_per_detection(detections: list[dict], date_regex) -> list:
+    """The previous `exp_image_handler` loop, kept as the baseline"""
+    detected_dates = []
+    for text in detections:
+        detected_text = "".join(text["DetectedText"].split())
+        result = date_regex.match(detected_text)
+        if result is not None:
+            capture_groups = result.groups()
+            detected_date = create_date(
+                capture_groups[0], capture_groups[2], capture_groups[3]
+            )
+            if detected_date is not None:
+                detected_dates.append(detected_date)
+    detected_dates.sort(reverse=True)
+    return detected_dates
+
+
+def find_dates_per_detection(detections: list[dict], date_regex) -> list:
+    """Search anywhere in every WORD and LINE detection without deduplication"""
+    detected_dates = [
+        match.value
+        for text in detections
+        for match in find_dates("".join(text["DetectedText"].split()), date_regex)
+    ]
+    detected_dates.sort(reverse=True)
+    return detected_dates
+
+
+if __name__ == "__main__":
+    date_regex = get_date_regex()
+    repeat_number = 200
+
+    for line_count in [50, 200, 500]:
+        detections = create_detections(line_count)
+        time_per_detection = min(
+            repeat(
+                lambda: detect_dates_per_detection(detections, date_regex),
+                number=repeat_number,
+                repeat=3,
+            )
+        )
+        time_find_dates = min(
+            repeat(
+                lambda: find_dates_per_detection(detections, date_regex),
+                number=repeat_number,
+                repeat=3,
+            )
+        )
+        time_batched = min(
+            repeat(
+                lambda: detect_dates(detections, date_regex),
+                number=repeat_number,
+                repeat=3,
+            )
+        )
+        print(f"{len(detections)} detections ({line_count} lines)")
+        print(f"  per detection (match only): {time_per_detection / repeat_number * 1e3:.3f} ms/image")
+        print(f"  per detection (search):     {time_find_dates / repeat_number * 1e3:.3f} ms/image")
+        print(f"  detect_dates (search):      {time_batched / repeat_number * 1e3:.3f} ms/image")
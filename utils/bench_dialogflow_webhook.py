@@ -0,0 +1,75 @@
+"""
+Compare the in-repo `dialogflow_webhook` codec of jumnoiFulfillment against
+`dialogflow_fulfillment` (when it is installed): the import time in a fresh
+interpreter, as on a cold start, and the time to handle a webhook request and
+build its response.
+"""
+import importlib
+import statistics
+import subprocess
+import sys
+import timeit
+from pathlib import Path
+
+FUNCTION_DIR = Path(__file__).resolve().parent.parent / "jumnoiFulfillment"
+sys.path.insert(0, str(FUNCTION_DIR))
+
+from test_dialogflow_webhook import REQUEST  # noqa: E402
+
+IMPORT = """
+from time import perf_counter
+start = perf_counter()
+from {module} import Payload, WebhookClient
+print(perf_counter() - start)
+"""
+
+
+def import_time(module: str, repeat: int) -> float:
+    """Return the median import time in ms of the module in a fresh interpreter"""
+    times = [
+        float(
+            subprocess.run(
+                [sys.executable, "-c", IMPORT.format(module=module)],
+                cwd=FUNCTION_DIR,
+                capture_output=True,
+                check=True,
+                text=True,
+            ).stdout
+        )
+        for _ in range(repeat)
+    ]
+    return statistics.median(times) * 1e3
+
+
+def request_time(module: str, number: int) -> float:
+    """Return the time in us to handle a request like the exp image intent"""
+    codec = importlib.import_module(module)
+
+    def handler(agent):
+        user_id = agent.original_request["payload"]["data"]["source"]["userId"]
+        agent.context.set(
+            "noteexp-expimage-followup",
+            lifespan_count=1,
+            parameters={"expDate": "2022-06-20", "userId": user_id},
+        )
+        agent.add(codec.Payload({"line": {"type": "text", "text": "2022-06-20"}}))
+
+    def handle():
+        agent = codec.WebhookClient(REQUEST)
+        agent.handle_request({"Note Exp - exp image": handler})
+        return agent.response
+
+    return min(timeit.repeat(handle, number=number, repeat=5)) / number * 1e6
+
+
+if __name__ == "__main__":
+    for module in ("dialogflow_webhook", "dialogflow_fulfillment"):
+        try:
+            importlib.import_module(module)
+        except ImportError:
+            print(f"{module:24} not installed")
+            continue
+        print(
+            f"{module:24} import {import_time(module, 20):6.2f} ms, "
+            f"request {request_time(module, 10000):6.2f} us"
+        )
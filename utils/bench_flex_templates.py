@@ -0,0 +1,55 @@
+"""
+Compare building and serializing a carousel message of 12 bubbles as a nested
+dict serialized with `json.dumps`, as before, against splicing the fields into
+the pre-serialized bubble template of `flex_templates`.
+"""
+import json
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "common"))
+
+import flex_templates  # noqa: E402
+
+ITEMS = [
+    (
+        f"https://bucket.s3.ap-southeast-1.amazonaws.com/thumbnail/{1000 + i}",
+        f"วันหมดอายุ: {i + 1:02d} June 2022",
+        "#03303A",
+    )
+    for i in range(flex_templates.MAX_CAROUSEL_BUBBLES)
+]
+
+
+def build_dict() -> str:
+    return json.dumps(
+        {
+            "type": "flex",
+            "altText": flex_templates.EXPIRY_ALT_TEXT,
+            "contents": {
+                "type": "carousel",
+                "contents": [
+                    flex_templates.expiry_bubble(url, text, color, warning=False)
+                    for url, text, color in ITEMS
+                ],
+            },
+        }
+    )
+
+
+def build_template() -> str:
+    return flex_templates.carousel_message(
+        [
+            flex_templates.EXPIRY_BUBBLE.render(url=url, text=text, color=color)
+            for url, text, color in ITEMS
+        ]
+    )
+
+
+if __name__ == "__main__":
+    assert json.loads(build_dict()) == json.loads(build_template())
+    number = 2000
+    for name, func in (("dict + json.dumps", build_dict), ("template", build_template)):
+        seconds = min(timeit.repeat(func, number=number, repeat=5)) / number
+        print(f"{name:18} {seconds * 1e6:8.1f} us per carousel, {len(func())} bytes")
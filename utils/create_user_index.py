@@ -0,0 +1,67 @@
+"""
+Add the `userId`/`expDate` global secondary index that jumnoiFulfillment queries
+for the items of a user, and wait until it is active. The table is keyed by
+`expDate` and `userId`, which jumnoiDaily queries by date, so the index swaps the
+keys and projects only the attributes read by the "Get memo" intent.
+
+Usage: python utils/create_user_index.py <table name> [index name]
+"""
+import sys
+import time
+
+import boto3
+
+INDEX_NAME = "userId-expDate-index"
+PROJECTED_ATTRIBUTES = ["s3Url", "thumbnails"]
+
+if __name__ == "__main__":
+    table_name = sys.argv[1]
+    index_name = sys.argv[2] if len(sys.argv) > 2 else INDEX_NAME
+    dynamodb_client = boto3.client("dynamodb")
+
+    table = dynamodb_client.describe_table(TableName=table_name)["Table"]
+    indexes = table.get("GlobalSecondaryIndexes", [])
+    if any(index["IndexName"] == index_name for index in indexes):
+        print(f"Index {index_name} already exists")
+    else:
+        index = {
+            "IndexName": index_name,
+            "KeySchema": [
+                {"AttributeName": "userId", "KeyType": "HASH"},
+                {"AttributeName": "expDate", "KeyType": "RANGE"},
+            ],
+            "Projection": {
+                "ProjectionType": "INCLUDE",
+                "NonKeyAttributes": PROJECTED_ATTRIBUTES,
+            },
+        }
+        # a table with provisioned capacity needs it for the index as well
+        throughput = table.get("ProvisionedThroughput", {})
+        if throughput.get("ReadCapacityUnits"):
+            index["ProvisionedThroughput"] = {
+                "ReadCapacityUnits": throughput["ReadCapacityUnits"],
+                "WriteCapacityUnits": throughput["WriteCapacityUnits"],
+            }
+        dynamodb_client.update_table(
+            TableName=table_name,
+            AttributeDefinitions=[
+                {"AttributeName": "userId", "AttributeType": "S"},
+                {"AttributeName": "expDate", "AttributeType": "S"},
+            ],
+            GlobalSecondaryIndexUpdates=[{"Create": index}],
+        )
+        print(f"Creating index {index_name}")
+
+    dynamodb_client.get_waiter("table_exists").wait(TableName=table_name)
+    while True:
+        table = dynamodb_client.describe_table(TableName=table_name)["Table"]
+        index = next(
+            index
+            for index in table["GlobalSecondaryIndexes"]
+            if index["IndexName"] == index_name
+        )
+        if index["IndexStatus"] == "ACTIVE":
+            break
+        print(f"Index {index_name} is {index['IndexStatus']}")
+        time.sleep(15)
+    print(f"Index {index_name} is active")
@@ -0,0 +1,98 @@
+"""
+Evaluate the accuracy and the speed of the date detection on a corpus of
+Rekognition `detect_text` responses.
+
+Each JSON file in the corpus is a `detect_text` response with 2 extra keys:
+    - ExpectedDate: The expiry date on the image in ISO format, or null
+    - Today: The date the image was sent, used to rank the detected dates
+
+Usage: python utils/eval_date_detection.py [--corpus DIR] [--repeat N]
+"""
+import argparse
+import json
+import sys
+from datetime import date
+from pathlib import Path
+from time import perf_counter
+from typing import Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "jumnoiFulfillment"))
+
+from date_detection import detect_dates, find_dates, get_date_regex  # noqa: E402
+
+
+def load_corpus(corpus_dir: Path) -> list[tuple[str, dict, Optional[date], date]]:
+    corpus = []
+    for path in sorted(corpus_dir.glob("*.json")):
+        with open(path, encoding="utf-8") as f:
+            response = json.load(f)
+        expected = response["ExpectedDate"]
+        corpus.append(
+            (
+                path.stem,
+                response,
+                date.fromisoformat(expected) if expected is not None else None,
+                date.fromisoformat(response["Today"]),
+            )
+        )
+    return corpus
+
+
+def percentile(values: list[float], percent: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * percent / 100))]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--corpus", type=Path, default=Path(__file__).resolve().parent / "date_corpus"
+    )
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    date_regex = get_date_regex()
+
+    # accuracy of the first proposed date
+    true_positive = false_positive = false_negative = 0
+    for name, response, expected, today in corpus:
+        detected_dates = detect_dates(response["TextDetections"], date_regex, today)
+        proposed = detected_dates[0] if detected_dates else None
+        if proposed == expected:
+            true_positive += expected is not None
+        else:
+            false_positive += proposed is not None
+            false_negative += expected is not None
+            print(f"MISS {name}: expected {expected}, proposed {proposed}")
+
+    precision = true_positive / max(true_positive + false_positive, 1)
+    recall = true_positive / max(true_positive + false_negative, 1)
+    print(f"images:    {len(corpus)}")
+    print(f"precision: {precision:.3f}")
+    print(f"recall:    {recall:.3f}")
+
+    # throughput of the regex and create_date over every detected text
+    texts = [
+        "".join(detection["DetectedText"].split())
+        for _, response, _, _ in corpus
+        for detection in response["TextDetections"]
+    ]
+    match_count = 0
+    start = perf_counter()
+    for _ in range(args.repeat):
+        for text in texts:
+            match_count += len(find_dates(text, date_regex))
+    elapsed = perf_counter() - start
+    print(f"texts/s:   {len(texts) * args.repeat / elapsed:,.0f}")
+    print(f"matches/s: {match_count / elapsed:,.0f}")
+
+    # latency of the whole detection for each image
+    latencies = []
+    for _ in range(args.repeat):
+        for _, response, _, today in corpus:
+            start = perf_counter()
+            detect_dates(response["TextDetections"], date_regex, today)
+            latencies.append((perf_counter() - start) * 1e3)
+    print(f"p50:       {percentile(latencies, 50):.3f} ms/image")
+    print(f"p99:       {percentile(latencies, 99):.3f} ms/image")
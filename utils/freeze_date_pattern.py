@@ -0,0 +1,27 @@
+"""
+Freeze the date regex pattern and the month numbers into
+`jumnoiFulfillment/date_pattern.py`, so a cold start of the function only has to
+import 2 constants. Run it again after changing `build_date_pattern` or
+`build_month_number`; `make package` runs it before packaging jumnoiFulfillment.
+"""
+import sys
+from pathlib import Path
+
+FUNCTION_DIR = Path(__file__).resolve().parent.parent / "jumnoiFulfillment"
+sys.path.insert(0, str(FUNCTION_DIR))
+
+from date_detection import build_date_pattern, build_month_number  # noqa: E402
+
+if __name__ == "__main__":
+    month_number = "".join(
+        f"    {month!r}: {idx},\n" for month, idx in build_month_number().items()
+    )
+    source = (
+        "# Generated by utils/freeze_date_pattern.py, do not edit.\n"
+        f"DATE_PATTERN = {build_date_pattern()!r}\n"
+        "\n"
+        f"MONTH_NUMBER = {{\n{month_number}}}\n"
+    )
+    with open(FUNCTION_DIR / "date_pattern.py", "w", encoding="utf-8") as f:
+        f.write(source)
+    print(f"Frozen date pattern into {FUNCTION_DIR / 'date_pattern.py'}")